@@ -1,13 +1,39 @@
 
 
 """Command Line Calculator A well-structured calculator """
+import csv
+import json
 import math
 import operator
+import sys
+import time
 from abc import ABC, abstractmethod
-from typing import Union, List, Dict, Callable
+from typing import Union, List, Dict, Callable, NamedTuple, Optional, Iterable, Iterator, TextIO, Tuple, Mapping
+from collections import Counter, OrderedDict, deque
+from contextlib import ExitStack
+from decimal import MAX_EMAX, MIN_EMIN, Context, Decimal, InvalidOperation, Overflow, localcontext
+from itertools import islice
+from types import MappingProxyType
 from enum import Enum
 import re
 
+import aggregates
+import combinatorics
+
+# NumPy is optional and slow to import; evaluate_array loads it on first use
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required for evaluate_array (pip install numpy)") from None
+        np = numpy
+    return np
+
 
 class OperationType(Enum):
     """Enumeration for different types of calculator operations"""
@@ -15,10 +41,12 @@ class OperationType(Enum):
     SCIENTIFIC = "scientific"
     LOGARITHMIC = "logarithmic"
     CONVERSION = "conversion"
+    STATISTICAL = "statistical"
 
 
 class Operation(ABC):
     """Abstract base class for all calculator operations"""
+    __slots__ = ("name", "symbol", "operation_type")
 
     def __init__(self, name: str, symbol: str, operation_type: OperationType):
         self.name = name
@@ -35,6 +63,44 @@ class Operation(ABC):
         """Validate the arguments for this operation"""
         pass
 
+    def valid_mask(self, *arrays):
+        """Element-wise counterpart of validate_args; None means every element is valid"""
+        return None
+
+    def estimate(self, *operands: Tuple[float, bool]) -> Tuple[float, bool]:
+        """Upper bound on log2|result| and whether the result may be an exact integer.
+
+        operands are the same (bits, exact) pairs for each argument. The default
+        assumes a float result, whose magnitude is bounded by the float range.
+        """
+        return FLOAT_BITS, False
+
+    def execute_array(self, *arrays):
+        """Execute the operation element-wise; invalid elements become NaN"""
+        mask = self.valid_mask(*arrays)
+        if mask is not None:
+            # Substitute a harmless value so the ufunc never sees out-of-domain input
+            arrays = [np.where(mask, arr, 1.0) for arr in arrays]
+        result = self.vectorized()(*arrays)
+        if mask is not None:
+            result = np.where(mask, result, np.nan)
+        return result
+
+    def compiled(self) -> Callable:
+        """Callable used by compiled expressions.
+
+        Defaults to execute (validated); subclasses return the raw function where
+        it already rejects out-of-domain input on its own.
+        """
+        return self.execute
+
+    def vectorized(self) -> Callable:
+        """NumPy ufunc equivalent of this operation, falling back to np.vectorize"""
+        ufunc = getattr(np, NUMPY_UFUNCS.get(self.symbol, ""), None)
+        if ufunc is None:
+            ufunc = np.vectorize(self.func, otypes=[float])
+        return ufunc
+
 
 # type(a) == int                                             isinstance(a, int)
 # This checks if the exact type of a is int.                 This checks if a is an instance of int or a subclass of int.
@@ -42,6 +108,7 @@ class Operation(ABC):
 
 class BasicOperation(Operation):
     """Basic arithmetic operations like +, -, *, /"""
+    __slots__ = ("func",)
 
     def __init__(self, name: str, symbol: str, func: Callable):
         super().__init__(name, symbol, OperationType.BASIC)
@@ -50,17 +117,45 @@ class BasicOperation(Operation):
     def execute(self, a: float, b: float) -> float:
         if not self.validate_args(a, b):
             raise ValueError(f"Invalid arguments for {self.name}")
-        return self.func(a, b)
+        return _apply(self.func, a, b)
 
     def validate_args(self, a: float, b: float) -> bool:
-        if self.symbol == "/" and b == 0:
+        if self.symbol in ("/", "//", "%") and b == 0:
             raise ZeroDivisionError("Cannot divide by zero")
-        return isinstance(a, (int, float)) and isinstance(b, (int, float))
+        return isinstance(a, NUMBER_TYPES) and isinstance(b, NUMBER_TYPES)
+
+    def compiled(self) -> Callable:
+        # operator.* raise ZeroDivisionError themselves
+        return self.func
+
+    def estimate(self, a: Tuple[float, bool], b: Tuple[float, bool]) -> Tuple[float, bool]:
+        (a_bits, a_exact), (b_bits, b_exact) = a, b
+        exact = a_exact and b_exact
+        if self.symbol == "**":
+            return _estimate_power(a, b)
+        if self.symbol in ("+", "-"):
+            bits = max(a_bits, b_bits) + 1
+        elif self.symbol == "*":
+            bits = a_bits + b_bits
+        elif self.symbol == "//":
+            bits = a_bits
+        elif self.symbol == "%":
+            bits = b_bits
+        else:
+            return FLOAT_BITS, False
+        return (bits, True) if exact else (min(bits, FLOAT_BITS), False)
 
+    def valid_mask(self, a, b):
+        if self.symbol in ("/", "//", "%"):
+            return np.broadcast_to(b != 0, np.broadcast(a, b).shape)
+        if self.symbol == "**":
+            return _power_mask(a, b)
+        return None
 
 
 class UnaryOperation(Operation):
     """Unary operations like sqrt, sin, cos, etc."""
+    __slots__ = ("func",)
 
     def __init__(self, name: str, symbol: str, operation_type: OperationType, func: Callable):
         super().__init__(name, symbol, operation_type)
@@ -69,78 +164,1026 @@ class UnaryOperation(Operation):
     def execute(self, a: float) -> float:
         if not self.validate_args(a):
             raise ValueError(f"Invalid argument for {self.name}")
+        if isinstance(a, Decimal):
+            return _decimal(_DECIMAL_FUNCTIONS[self.symbol], a)
         return self.func(a)
 
     def validate_args(self, a: float) -> bool:
         # Special validation for specific functions
         if self.symbol == "sqrt" and a < 0:
             raise ValueError("Cannot take square root of negative number")
-        if self.symbol == "!" and (a < 0 or not isinstance(a, int) and not a.is_integer()):
+        if self.symbol == "!" and (a < 0 or not _is_integer(a)):
             raise ValueError("Factorial is only defined for non-negative integers")
         if self.symbol in ["asin", "acos"] and (a < -1 or a > 1):
             raise ValueError(f"{self.name} domain error: input must be between -1 and 1")
-        return isinstance(a, (int, float))
+        if self.symbol == "lnfact" and a < 0:
+            raise ValueError("Log-factorial is only defined for non-negative numbers")
+        if self.symbol == "lgamma" and a <= 0 and _is_integer(a):
+            raise ValueError("Log-gamma is undefined at zero and negative integers")
+        if isinstance(a, Decimal) and self.symbol not in _DECIMAL_FUNCTIONS:
+            raise ValueError(f"{self.name} of an approximate result is too large for exact arithmetic")
+        return isinstance(a, NUMBER_TYPES)
+
+    def valid_mask(self, a):
+        if self.symbol == "sqrt":
+            return a >= 0
+        if self.symbol == "!":
+            return (a >= 0) & (a == np.floor(a))
+        if self.symbol in ["asin", "acos"]:
+            return (a >= -1) & (a <= 1)
+        if self.symbol in ["ln", "log"]:
+            return a > 0
+        if self.symbol == "lnfact":
+            return a >= 0
+        if self.symbol == "lgamma":
+            return ~((a <= 0) & (a == np.floor(a)))
+        return None
+
+    def compiled(self) -> Callable:
+        # factorial truncates via int(), so it keeps its validation
+        if self.symbol == "!":
+            return self.execute
+        return self.func
+
+    def estimate(self, a: Tuple[float, bool]) -> Tuple[float, bool]:
+        bits, exact = a
+        if self.symbol == "!":
+            # log2(n!) for the largest n the operand can hold
+            return math.lgamma(2.0 ** min(bits, 1000) + 1) / math.log(2), True
+        if self.symbol == "abs":
+            return a
+        if self.symbol in ("ceil", "floor"):
+            return bits, True
+        if self.symbol in ("exp", "tan", "lgamma", "lnfact"):
+            return FLOAT_BITS, False
+        # Remaining functions shrink their input or scale it by a small constant
+        return min(bits + 6, FLOAT_BITS), False
+
+    def vectorized(self) -> Callable:
+        if self.symbol == "!":
+            return np.vectorize(_gamma_factorial, otypes=[float])
+        return super().vectorized()
 
 
 class PowerOperation(Operation):
     """Power operations """
+    __slots__ = ()
+
     def __init__(self):
         super().__init__("power", "^", OperationType.BASIC)
 
     def execute(self, base: float, exponent: float) -> float:
         if not self.validate_args(base, exponent):
             raise ValueError("Invalid arguments for power operation")
-        return pow(base, exponent)
+        return _apply(pow, base, exponent)
 
     def validate_args(self, base: float, exponent: float) -> bool:
         if base == 0 and exponent < 0:
             raise ValueError("Cannot raise 0 to negative power")
-        if base < 0 and not isinstance(exponent, int) and not exponent.is_integer():
+        if base < 0 and not _is_integer(exponent):
             raise ValueError("Cannot raise negative number to non-integer power")
-        return isinstance(base, (int, float)) and isinstance(exponent, (int, float))
+        return isinstance(base, NUMBER_TYPES) and isinstance(exponent, NUMBER_TYPES)
+
+    def estimate(self, base: Tuple[float, bool], exponent: Tuple[float, bool]) -> Tuple[float, bool]:
+        return _estimate_power(base, exponent)
+
+    def valid_mask(self, base, exponent):
+        return _power_mask(base, exponent)
+
+    def vectorized(self) -> Callable:
+        return np.power
+
+
+class FunctionOperation(Operation):
+    """Functions of several arguments called as name(a, b), like nCr and nPr; arity None means variadic"""
+    __slots__ = ("func", "arity")
+
+    def __init__(self, name: str, symbol: str, operation_type: OperationType, func: Callable, arity: Optional[int]):
+        super().__init__(name, symbol, operation_type)
+        self.func = func
+        self.arity = arity
+
+    def execute(self, *args) -> float:
+        if not self.validate_args(*args):
+            raise ValueError(f"Invalid arguments for {self.name}")
+        return self.func(*args)
+
+    def validate_args(self, *args) -> bool:
+        if self.arity is not None and len(args) != self.arity:
+            raise ValueError(f"{self.symbol}() takes {self.arity} arguments but {len(args)} were given")
+        if self.symbol in ["nCr", "nPr", "lnCr"] and any(a < 0 or not _is_integer(a) for a in args):
+            raise ValueError(f"{self.name} is only defined for non-negative integers")
+        if any(isinstance(a, Decimal) for a in args):
+            raise ValueError(f"{self.name} of an approximate result is too large for exact arithmetic")
+        return all(isinstance(a, (int, float)) for a in args)
+
+    def valid_mask(self, *arrays):
+        if self.symbol in ["nCr", "nPr", "lnCr"]:
+            mask = np.ones(np.broadcast(*arrays).shape, dtype=bool)
+            for a in arrays:
+                mask &= (a >= 0) & (a == np.floor(a))
+            return mask
+        return None
+
+    def vectorized(self) -> Callable:
+        return np.vectorize(_float_result(self.func), otypes=[float])
+
+    def estimate(self, *operands: Tuple[float, bool]) -> Tuple[float, bool]:
+        if self.symbol in ["nCr", "nPr"]:
+            # Both are at most n**r
+            return _estimate_power(operands[0], operands[1])
+        return FLOAT_BITS, False
+
+
+# Operation symbol -> name of the equivalent NumPy ufunc used by evaluate_array
+NUMPY_UFUNCS = {
+    "+": "add", "-": "subtract", "*": "multiply", "/": "true_divide",
+    "//": "floor_divide", "%": "mod", "**": "power",
+    "sqrt": "sqrt", "abs": "abs", "ln": "log", "log": "log10", "exp": "exp",
+    "ceil": "ceil", "floor": "floor",
+    "sin": "sin", "cos": "cos", "tan": "tan",
+    "asin": "arcsin", "acos": "arccos", "atan": "arctan",
+    "rad": "radians", "deg": "degrees",
+}
+
+
+class AggregateOperation(Operation):
+    """Statistics over any mix of numbers, ranges and arrays, e.g. mean(1, 2, 3) or sum(range(1, 101))"""
+    __slots__ = ("func",)
+
+    def __init__(self, name: str, symbol: str, func: Callable):
+        super().__init__(name, symbol, OperationType.STATISTICAL)
+        self.func = func
+
+    def execute(self, *args) -> float:
+        if not self.validate_args(*args):
+            raise ValueError(f"Invalid arguments for {self.name}")
+        return self.func(*args)
+
+    def validate_args(self, *args) -> bool:
+        if not args:
+            raise ValueError(f"{self.symbol}() needs at least one value")
+        if self.symbol == "percentile" and not isinstance(args[0], (int, float)):
+            raise ValueError("percentile() takes the percentile as its first argument")
+        return all(isinstance(a, (int, float, range, list, tuple)) or hasattr(a, "dtype") for a in args)
+
+    def execute_array(self, *arrays):
+        """Aggregate the arguments separately at each position, as the compiled expression does point by point"""
+        if self.symbol == "percentile":
+            percent, arrays = arrays[0], arrays[1:]
+        else:
+            percent = 50.0
+        if not arrays:
+            raise ValueError(f"{self.symbol}() needs at least one value")
+        percent, *arrays = np.broadcast_arrays(percent, *[np.asarray(a, dtype=np.float64) for a in arrays])
+        stack = np.stack(arrays)
+        if self.symbol in ("percentile", "median"):
+            return _stacked_percentile(stack, percent)
+        if self.symbol in ("var", "stddev"):
+            if len(stack) < 2:
+                return np.full(stack.shape[1:], np.nan)
+            variance = np.var(stack, axis=0, ddof=1)
+            return np.sqrt(variance) if self.symbol == "stddev" else variance
+        reduce = {"sum": np.sum, "mean": np.mean, "min": np.min, "max": np.max}[self.symbol]
+        return reduce(stack, axis=0)
+
+
+# log2 of the largest finite float; float results can never need more bits than this
+FLOAT_BITS = 1024.0
+
+# Decimal results are combinatorics approximations beyond float range
+NUMBER_TYPES = (int, float, Decimal)
+
+# Unary operations that also work on Decimal approximations
+_DECIMAL_FUNCTIONS = {"sqrt": Decimal.sqrt, "ln": Decimal.ln, "log": Decimal.log10, "exp": Decimal.exp, "abs": abs}
+
+
+def _apply(func: Callable, a, b):
+    """func(a, b), in Decimal arithmetic without an exponent limit if either is a Decimal"""
+    if isinstance(a, Decimal) or isinstance(b, Decimal):
+        return _decimal(func, a, b)
+    return func(a, b)
+
+
+def _decimal(func: Callable, *values) -> Union[float, Decimal]:
+    """func(*values) in Decimal arithmetic, as precise as the least precise Decimal among them"""
+    with localcontext(_decimal_context(*values)):
+        try:
+            return _narrow(func(*[Decimal(value) for value in values]))
+        except (InvalidOperation, Overflow):
+            # e.g. // and % of an approximation need digits it does not have
+            raise ValueError("Result too large for exact arithmetic") from None
+
+
+def _decimal_context(*values) -> Context:
+    """Context without an exponent limit, rounding to the significant digits of the least precise Decimal"""
+    digits = min(len(value.as_tuple().digits) for value in values if isinstance(value, Decimal))
+    return Context(prec=digits, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+
+def _narrow(value: Decimal) -> Union[float, Decimal]:
+    """value as a float when it fits, so Decimals only ever hold results beyond float range"""
+    as_float = float(value)
+    if math.isfinite(as_float) and (as_float != 0 or value == 0):
+        return as_float
+    return value
+
+
+def _may_be_decimal(*nodes: "Node") -> bool:
+    """Whether any of the subtrees can evaluate to a Decimal approximation, which raw operators mishandle"""
+    for node in nodes:
+        if isinstance(node, Number) and isinstance(node.value, Decimal):
+            return True
+        if any(op.symbol in ("!", "nCr", "nPr") for op in node.operations()):
+            return True
+    return False
+
+
+def _negate(value):
+    """-value; Decimal negation would round to the current context, copy_negate never does"""
+    return value.copy_negate() if isinstance(value, Decimal) else -value
+
+
+def _is_integer(value) -> bool:
+    """float.is_integer for ints, floats and Decimals alike"""
+    if isinstance(value, Decimal):
+        return value == value.to_integral_value()
+    return isinstance(value, int) or value.is_integer()
+
+
+def _estimate_power(base: Tuple[float, bool], exponent: Tuple[float, bool]) -> Tuple[float, bool]:
+    """Upper bound on log2|base ** exponent| given (bits, exact) bounds of both operands"""
+    (base_bits, base_exact), (exp_bits, exp_exact) = base, exponent
+    bits = base_bits * 2.0 ** min(exp_bits, 1000)
+    if base_exact and exp_exact:
+        return bits, True
+    return min(bits, FLOAT_BITS), False
+
+
+def _power_mask(base, exponent):
+    """Element-wise validate_args of PowerOperation, shared by ^ and **"""
+    zero_to_negative = (base == 0) & (exponent < 0)
+    negative_to_fraction = (base < 0) & (exponent != np.floor(exponent))
+    return ~(zero_to_negative | negative_to_fraction)
+
+
+def _float_result(func: Callable) -> Callable:
+    """Wrap an integer-valued function so results beyond float range become inf"""
+    def wrapper(*args):
+        try:
+            return float(func(*args))
+        except OverflowError:
+            return math.inf
+    return wrapper
+
+
+def _gamma_factorial(x: float) -> float:
+    """Factorial of a non-negative integral float via the gamma function"""
+    try:
+        return math.gamma(x + 1)
+    except OverflowError:
+        return math.inf
+
+
+class Token(NamedTuple):
+    """A lexical token: kind is one of 'num', 'name', 'op' or 'end'"""
+    kind: str
+    text: str
+    value: Union[int, float, None] = None
+
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<num>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+      | (?P<op>\*\*|//|[-+*/%^!(),])
+    )""", re.VERBOSE)
+
+
+def tokenize(expr: str) -> List[Token]:
+    """Split an expression into tokens, terminated by an 'end' token"""
+    tokens = []
+    pos = 0
+    length = len(expr)
+    while pos < length:
+        match = _TOKEN_RE.match(expr, pos)
+        if match is None:
+            if expr[pos:].isspace():
+                break
+            pos = length - len(expr[pos:].lstrip())
+            raise ValueError(f"Unexpected character '{expr[pos]}' at position {pos}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "num":
+            value = float(text) if any(c in text for c in ".eE") else int(text)
+            tokens.append(Token(kind, text, value))
+        else:
+            tokens.append(Token(kind, text))
+        pos = match.end()
+    tokens.append(Token("end", ""))
+    return tokens
+
+
+class Node(ABC):
+    """Base class for nodes of a parsed expression tree"""
+    __slots__ = ()
+
+    @abstractmethod
+    def evaluate(self, env: Dict[str, float]) -> float:
+        """Evaluate the subtree rooted at this node with variables bound by env"""
+        pass
+
+    @abstractmethod
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        """Evaluate the subtree element-wise over NumPy arrays"""
+        pass
+
+    @abstractmethod
+    def variables(self) -> frozenset:
+        """Names of the variables referenced in the subtree"""
+        pass
+
+    @abstractmethod
+    def fold(self) -> "Node":
+        """Return an equivalent tree with variable-free subtrees folded into constants"""
+        pass
+
+    @abstractmethod
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        """Build a closure evaluating the subtree from a dict of variable values"""
+        pass
+
+    @abstractmethod
+    def operations(self) -> Iterator[Operation]:
+        """Operations executed by one evaluation of the subtree"""
+        pass
+
+    @abstractmethod
+    def estimate(self) -> "Estimate":
+        """Statically estimate the size of the result and of the largest exact intermediate"""
+        pass
+
+    @abstractmethod
+    def as_float(self) -> "Node":
+        """Return an equivalent tree whose literals are floats, so no exact big integers arise"""
+        pass
+
+    @staticmethod
+    def _estimate_op(op: Operation, operands: List["Estimate"]) -> "Estimate":
+        bits, exact = op.estimate(*[(e.bits, e.exact) for e in operands])
+        cost = max([e.cost for e in operands] + [bits if exact else 0.0])
+        return Estimate(bits, exact, cost)
+
+
+class Estimate(NamedTuple):
+    """Static size estimate: bits bounds log2|value|, cost is the largest exact intermediate in bits"""
+    bits: float
+    exact: bool
+    cost: float
+
+
+class Number(Node):
+    """Numeric literal"""
+    __slots__ = ("value",)
+
+    def __init__(self, value: Union[int, float]):
+        self.value = value
+
+    def evaluate(self, env: Dict[str, float]) -> float:
+        return self.value
+
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        return np.float64(self.value)
+
+    def variables(self) -> frozenset:
+        return frozenset()
+
+    def fold(self) -> Node:
+        return self
+
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        value = self.value
+        return lambda env: value
+
+    def operations(self) -> Iterator[Operation]:
+        return iter(())
+
+    def estimate(self) -> Estimate:
+        if not isinstance(self.value, (int, float)):
+            # Folded sequences such as range(1, 10)
+            return Estimate(FLOAT_BITS, False, 0.0)
+        bits = math.log2(max(abs(self.value), 1))
+        exact = isinstance(self.value, int)
+        return Estimate(bits, exact, bits if exact else 0.0)
+
+    def as_float(self) -> Node:
+        return Number(float(self.value))
+
+
+class Variable(Node):
+    """Named variable bound at evaluation time"""
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def evaluate(self, env: Dict[str, float]) -> float:
+        try:
+            return env[self.name]
+        except KeyError:
+            raise ValueError(f"Unknown name '{self.name}'") from None
+
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        return self.evaluate(env)
+
+    def variables(self) -> frozenset:
+        return frozenset([self.name])
+
+    def fold(self) -> Node:
+        return self
+
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        return operator.itemgetter(self.name)
+
+    def operations(self) -> Iterator[Operation]:
+        return iter(())
+
+    def estimate(self) -> Estimate:
+        return Estimate(FLOAT_BITS, False, 0.0)
+
+    def as_float(self) -> Node:
+        return self
+
+
+class Negate(Node):
+    """Prefix minus"""
+    __slots__ = ("operand",)
+
+    def __init__(self, operand: Node):
+        self.operand = operand
+
+    def evaluate(self, env: Dict[str, float]) -> float:
+        return _negate(self.operand.evaluate(env))
+
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        return np.negative(self.operand.evaluate_array(env))
+
+    def variables(self) -> frozenset:
+        return self.operand.variables()
+
+    def fold(self) -> Node:
+        operand = self.operand.fold()
+        if isinstance(operand, Number):
+            return Number(_negate(operand.value))
+        return Negate(operand)
+
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        operand = self.operand.compile()
+        return lambda env: _negate(operand(env))
+
+    def operations(self) -> Iterator[Operation]:
+        return self.operand.operations()
+
+    def estimate(self) -> Estimate:
+        return self.operand.estimate()
+
+    def as_float(self) -> Node:
+        return Negate(self.operand.as_float())
+
+
+class BinaryOp(Node):
+    """Binary operator applied to two subexpressions"""
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op: Operation, left: Node, right: Node):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def evaluate(self, env: Dict[str, float]) -> float:
+        return self.op.execute(self.left.evaluate(env), self.right.evaluate(env))
+
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        return self.op.execute_array(self.left.evaluate_array(env), self.right.evaluate_array(env))
+
+    def variables(self) -> frozenset:
+        return self.left.variables() | self.right.variables()
+
+    def fold(self) -> Node:
+        left, right = self.left.fold(), self.right.fold()
+        if isinstance(left, Number) and isinstance(right, Number):
+            return Number(self.op.execute(left.value, right.value))
+        return BinaryOp(self.op, left, right)
+
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        func = self.op.execute if _may_be_decimal(self.left, self.right) else self.op.compiled()
+        # Inline constant operands so they cost no call at evaluation time
+        if isinstance(self.right, Number):
+            left, value = self.left.compile(), self.right.value
+            return lambda env: func(left(env), value)
+        if isinstance(self.left, Number):
+            value, right = self.left.value, self.right.compile()
+            return lambda env: func(value, right(env))
+        left, right = self.left.compile(), self.right.compile()
+        return lambda env: func(left(env), right(env))
+
+    def operations(self) -> Iterator[Operation]:
+        yield from self.left.operations()
+        yield from self.right.operations()
+        yield self.op
+
+    def estimate(self) -> Estimate:
+        left, right = self.left.estimate(), self.right.estimate()
+        if self.op.symbol in ("**", "^") and _negative_literal(self.right):
+            # An integer to a negative power is a float, never an exact integer
+            return Estimate(FLOAT_BITS, False, max(left.cost, right.cost))
+        return self._estimate_op(self.op, [left, right])
+
+    def as_float(self) -> Node:
+        return BinaryOp(self.op, self.left.as_float(), self.right.as_float())
+
+
+def _stacked_percentile(stack, percent):
+    """Percentile of each column of stack, interpolating like aggregates.percentile; NaN where percent is out of range"""
+    valid = (percent >= 0) & (percent <= 100)
+    ordered = np.sort(stack, axis=0)
+    index = (len(ordered) - 1) * np.where(valid, percent, 0) / 100
+    lower = np.floor(index).astype(np.intp)
+    upper = np.minimum(lower + 1, len(ordered) - 1)
+    low = np.take_along_axis(ordered, lower[np.newaxis], axis=0)[0]
+    high = np.take_along_axis(ordered, upper[np.newaxis], axis=0)[0]
+    return np.where(valid, low + (high - low) * (index - lower), np.nan)
+
+
+def _negative_literal(node: Node) -> bool:
+    """Whether node is a number below zero, such as the -100000 in 2**-100000"""
+    negative = False
+    while isinstance(node, Negate):
+        node, negative = node.operand, not negative
+    return (isinstance(node, Number) and isinstance(node.value, (int, float))
+            and node.value != 0 and (node.value < 0) != negative)
+
+
+class Call(Node):
+    """Unary operation applied to a subexpression, e.g. sqrt(x) or x!"""
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op: Operation, operand: Node):
+        self.op = op
+        self.operand = operand
+
+    def evaluate(self, env: Dict[str, float]) -> float:
+        return self.op.execute(self.operand.evaluate(env))
+
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        return self.op.execute_array(self.operand.evaluate_array(env))
+
+    def variables(self) -> frozenset:
+        return self.operand.variables()
+
+    def fold(self) -> Node:
+        operand = self.operand.fold()
+        if isinstance(operand, Number):
+            return Number(self.op.execute(operand.value))
+        return Call(self.op, operand)
+
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        func = self.op.execute if _may_be_decimal(self.operand) else self.op.compiled()
+        operand = self.operand.compile()
+        return lambda env: func(operand(env))
+
+    def operations(self) -> Iterator[Operation]:
+        yield from self.operand.operations()
+        yield self.op
+
+    def estimate(self) -> Estimate:
+        return self._estimate_op(self.op, [self.operand.estimate()])
+
+    def as_float(self) -> Node:
+        return Call(self.op, self.operand.as_float())
+
+
+class FunctionCall(Node):
+    """Multi-argument function call, e.g. nCr(n, r)"""
+    __slots__ = ("op", "args")
+
+    def __init__(self, op: Operation, args: List[Node]):
+        self.op = op
+        self.args = args
+
+    def evaluate(self, env: Dict[str, float]) -> float:
+        return self.op.execute(*[arg.evaluate(env) for arg in self.args])
+
+    def evaluate_array(self, env: Dict[str, "np.ndarray"]) -> "np.ndarray":
+        return self.op.execute_array(*[arg.evaluate_array(env) for arg in self.args])
+
+    def variables(self) -> frozenset:
+        return frozenset().union(*(arg.variables() for arg in self.args))
+
+    def fold(self) -> Node:
+        args = [arg.fold() for arg in self.args]
+        if all(isinstance(arg, Number) for arg in args):
+            return Number(self.op.execute(*[arg.value for arg in args]))
+        return FunctionCall(self.op, args)
+
+    def compile(self) -> Callable[[Dict[str, float]], float]:
+        func = self.op.compiled()
+        args = [arg.compile() for arg in self.args]
+        if len(args) == 2:
+            first, second = args
+            return lambda env: func(first(env), second(env))
+        return lambda env: func(*[arg(env) for arg in args])
+
+    def operations(self) -> Iterator[Operation]:
+        for arg in self.args:
+            yield from arg.operations()
+        yield self.op
+
+    def estimate(self) -> Estimate:
+        return self._estimate_op(self.op, [arg.estimate() for arg in self.args])
+
+    def as_float(self) -> Node:
+        return FunctionCall(self.op, [arg.as_float() for arg in self.args])
+
+
+class CompiledExpression:
+    """Reusable callable for an expression; variables are bound by keyword, e.g. f(x=3)"""
+    __slots__ = ("expression", "variables", "_func")
+
+    def __init__(self, expression: str, tree: Node):
+        tree = tree.fold()
+        self.expression = expression
+        self.variables = tree.variables()
+        self._func = tree.compile()
+
+    def __call__(self, **variables) -> float:
+        try:
+            return self._func(variables)
+        except KeyError as e:
+            raise ValueError(f"Missing value for variable '{e.args[0]}'") from None
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.expression!r}, variables={sorted(self.variables)})"
+
+
+class Parser:
+    """Pratt (top-down operator precedence) parser producing an expression tree"""
+
+    # (left binding power, right binding power); right < left makes an operator right-associative
+    BINARY = {
+        "+": (10, 11), "-": (10, 11),
+        "*": (20, 21), "/": (20, 21), "//": (20, 21), "%": (20, 21),
+        "**": (41, 40), "^": (41, 40),
+    }
+    PREFIX_BP = 30
+    POSTFIX_BP = 50
+
+    def __init__(self, tokens: List[Token], operations: Dict[str, Operation], constants: Dict[str, float]):
+        self.tokens = tokens
+        self.operations = operations
+        self.constants = constants
+        self.pos = 0
+
+    def parse(self) -> Node:
+        node = self._expression(0)
+        token = self._peek()
+        if token.kind != "end":
+            raise ValueError(f"Unexpected token '{token.text}'")
+        return node
+
+    def _peek(self) -> Token:
+        return self.tokens[self.pos]
+
+    def _advance(self) -> Token:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _expect(self, text: str):
+        token = self._advance()
+        if token.text != text:
+            found = token.text or "end of expression"
+            raise ValueError(f"Expected '{text}' but found '{found}'")
+
+    def _expression(self, min_bp: int) -> Node:
+        left = self._prefix(self._advance())
+        while True:
+            token = self._peek()
+            if token.kind != "op":
+                break
+            if token.text == "!":
+                if self.POSTFIX_BP < min_bp:
+                    break
+                self._advance()
+                left = Call(self.operations["!"], left)
+                continue
+            binding = self.BINARY.get(token.text)
+            if binding is None or binding[0] < min_bp:
+                break
+            self._advance()
+            right = self._expression(binding[1])
+            left = BinaryOp(self.operations[token.text], left, right)
+        return left
+
+    def _prefix(self, token: Token) -> Node:
+        if token.kind == "num":
+            return Number(token.value)
+        if token.kind == "name":
+            if self._peek().text == "(":
+                return self._call(token.text)
+            if token.text in self.constants:
+                return Number(self.constants[token.text])
+            return Variable(token.text)
+        if token.text == "(":
+            node = self._expression(0)
+            self._expect(")")
+            return node
+        if token.text == "-":
+            return Negate(self._expression(self.PREFIX_BP))
+        if token.text == "+":
+            return self._expression(self.PREFIX_BP)
+        if token.kind == "end":
+            raise ValueError("Unexpected end of expression")
+        raise ValueError(f"Unexpected token '{token.text}'")
+
+    def _call(self, name: str) -> Node:
+        op = self.operations.get(name)
+        if not op or not isinstance(op, (UnaryOperation, FunctionOperation, AggregateOperation)):
+            raise ValueError(f"Unknown function {name}")
+        self._expect("(")
+        args = [self._expression(0)]
+        while self._peek().text == ",":
+            self._advance()
+            args.append(self._expression(0))
+        self._expect(")")
+        if isinstance(op, UnaryOperation):
+            if len(args) != 1:
+                raise ValueError(f"{name}() takes 1 argument but {len(args)} were given")
+            return Call(op, args[0])
+        if isinstance(op, FunctionOperation) and op.arity is not None and len(args) != op.arity:
+            raise ValueError(f"{name}() takes {op.arity} arguments but {len(args)} were given")
+        return FunctionCall(op, args)
+
+
+class ExpressionCache:
+    """Bounded LRU cache of parsed expressions keyed by normalized expression text"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Node]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Node]:
+        node = self._entries.get(key)
+        if node is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return node
+
+    def put(self, key: str, node: Node):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = node
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _builtin_operations() -> List[Operation]:
+    """Create the built-in calculator operations"""
+
+    # Basic arithmetic operations
+    basic_ops = [
+        BasicOperation("addition", "+", operator.add),
+        BasicOperation("subtraction", "-", operator.sub),
+        BasicOperation("multiplication", "*", operator.mul),
+        BasicOperation("division", "/", operator.truediv),
+        BasicOperation("floor_division", "//", operator.floordiv),
+        BasicOperation("modulo", "%", operator.mod),
+        BasicOperation("power", "**", operator.pow)
+    ]
+
+    # Power operation
+    power_op = PowerOperation()
+
+    # Scientific/Mathematical operations
+    scientific_ops = [
+        UnaryOperation("square_root", "sqrt", OperationType.SCIENTIFIC, math.sqrt),
+        UnaryOperation("absolute", "abs", OperationType.SCIENTIFIC, abs),
+        UnaryOperation("factorial", "!", OperationType.SCIENTIFIC, combinatorics.factorial),
+        UnaryOperation("sine", "sin", OperationType.SCIENTIFIC, math.sin),
+        UnaryOperation("cosine", "cos", OperationType.SCIENTIFIC, math.cos),
+        UnaryOperation("tangent", "tan", OperationType.SCIENTIFIC, math.tan),
+        UnaryOperation("arc_sine", "asin", OperationType.SCIENTIFIC, math.asin),
+        UnaryOperation("arc_cosine", "acos", OperationType.SCIENTIFIC, math.acos),
+        UnaryOperation("arc_tangent", "atan", OperationType.SCIENTIFIC, math.atan),
+        UnaryOperation("natural_log", "ln", OperationType.LOGARITHMIC, math.log),
+        UnaryOperation("log_base_10", "log", OperationType.LOGARITHMIC, math.log10),
+        UnaryOperation("log_factorial", "lnfact", OperationType.LOGARITHMIC, combinatorics.log_factorial),
+        UnaryOperation("log_gamma", "lgamma", OperationType.LOGARITHMIC, math.lgamma),
+        UnaryOperation("exponential", "exp", OperationType.SCIENTIFIC, math.exp),
+        UnaryOperation("ceiling", "ceil", OperationType.SCIENTIFIC, math.ceil),
+        UnaryOperation("floor", "floor", OperationType.SCIENTIFIC, math.floor)
+    ]
+
+    # Combinatorics
+    combinatoric_ops = [
+        FunctionOperation("combinations", "nCr", OperationType.SCIENTIFIC, combinatorics.comb, 2),
+        FunctionOperation("permutations", "nPr", OperationType.SCIENTIFIC, combinatorics.perm, 2),
+        FunctionOperation("log_combinations", "lnCr", OperationType.LOGARITHMIC, combinatorics.log_comb, 2)
+    ]
+
+    # Statistics over numbers, ranges and arrays
+    statistical_ops = [
+        AggregateOperation("sum", "sum", aggregates.total),
+        AggregateOperation("mean", "mean", aggregates.mean),
+        AggregateOperation("variance", "var", aggregates.variance),
+        AggregateOperation("standard_deviation", "stddev", aggregates.stddev),
+        AggregateOperation("minimum", "min", aggregates.minimum),
+        AggregateOperation("maximum", "max", aggregates.maximum),
+        AggregateOperation("median", "median", aggregates.median),
+        AggregateOperation("percentile", "percentile", aggregates.percentile),
+        FunctionOperation("range", "range", OperationType.STATISTICAL, aggregates.integer_range, None)
+    ]
+
+    # Angle conversions
+    conversion_ops = [
+        UnaryOperation("to_radians", "rad", OperationType.CONVERSION, math.radians),
+        UnaryOperation("to_degrees", "deg", OperationType.CONVERSION, math.degrees)
+    ]
+
+    return basic_ops + [power_op] + scientific_ops + combinatoric_ops + statistical_ops + conversion_ops
+
+
+def _entry_points(group: str):
+    from importlib import metadata
+    try:
+        return metadata.entry_points(group=group)
+    except TypeError:  # Python < 3.10 returns a dict of groups
+        return metadata.entry_points().get(group, [])
+
+
+class OperationRegistry(Mapping):
+    """Read-only mapping of operation symbols and names to shared Operation objects.
+
+    Operations are stateless, so one registry is shared by every engine. Plugin
+    operations are loaded the first time a name they provide is looked up: each
+    entry point in the "calculator.operations" group is named after the symbol it
+    provides and loads to an Operation or a list of Operations (a family), all
+    of which are registered together.
+    """
+    ENTRY_POINT_GROUP = "calculator.operations"
+
+    def __init__(self, operations: Iterable[Operation]):
+        self._operations: Dict[str, Operation] = {}
+        self._plugins = None  # symbol -> entry point, discovered on the first miss
+        self._register(operations)
+
+    def _register(self, operations: Iterable[Operation]):
+        for op in operations:
+            self._operations[op.symbol] = op
+            self._operations[op.name] = op
+
+    def __getitem__(self, key: str) -> Operation:
+        op = self._operations.get(key)
+        if op is None and self._load_plugin(key):
+            op = self._operations.get(key)
+        if op is None:
+            raise KeyError(key)
+        return op
+
+    def __iter__(self):
+        return iter(self._operations)
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def _load_plugin(self, key: str) -> bool:
+        if self._plugins is None:
+            self._plugins = {ep.name: ep for ep in _entry_points(self.ENTRY_POINT_GROUP)}
+        entry_point = self._plugins.pop(key, None)
+        if entry_point is None:
+            return False
+        loaded = entry_point.load()
+        self._register([loaded] if isinstance(loaded, Operation) else loaded)
+        return True
+
+
+OPERATIONS = OperationRegistry(_builtin_operations())
+CONSTANTS: Mapping[str, float] = MappingProxyType({"pi": math.pi, "e": math.e})
+
+
+class LatencyRecorder:
+    """Count, total and percentiles of durations over a sliding window of recent samples"""
+
+    def __init__(self, window: int = 10000):
+        self.count = 0
+        self.total = 0.0
+        self._recent = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self._recent.append(seconds)
+
+    def percentile(self, percent: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "p50_ms": self.percentile(50) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+        }
+
+
+class EngineStats:
+    """Opt-in profiling counters for a CalculatorEngine"""
+
+    def __init__(self, window: int = 10000):
+        self.parse = LatencyRecorder(window)
+        self.execute = LatencyRecorder(window)
+        self.operation_calls: Counter = Counter()
+        self.errors: Counter = Counter()
+
+    def snapshot(self, cache_info: Dict) -> Dict:
+        return {
+            "evaluations": self.execute.count,
+            "parse": self.parse.summary(),
+            "execute": self.execute.summary(),
+            "cache": cache_info,
+            "operations": dict(self.operation_calls.most_common()),
+            "errors": dict(self.errors.most_common()),
+        }
+
+
+class EvaluationBudget:
+    """Limits for evaluating untrusted expressions with calculate/evaluate.
+
+    max_bits bounds the statically estimated size of any exact integer the
+    expression would build. Expressions over it are rejected with OverflowError
+    (on_exceed="reject") or evaluated with float literals instead
+    (on_exceed="float"), which overflows quickly rather than computing huge
+    integers; factorials, nCr and nPr over max_bits are then approximated.
+    timeout, in seconds, additionally runs each evaluation in a worker process
+    that is terminated if it overruns.
+
+    CalculatorEngine has no budget unless one is passed; the command line
+    calculator uses EvaluationBudget(max_bits=max_exact_bits).
+    """
+
+    def __init__(self, max_bits: int = 1 << 16, on_exceed: str = "float", timeout: Optional[float] = None):
+        if on_exceed not in ("reject", "float"):
+            raise ValueError(f"on_exceed must be 'reject' or 'float', not {on_exceed!r}")
+        self.max_bits = max_bits
+        self.on_exceed = on_exceed
+        self.timeout = timeout
+
+
+def _evaluate_tree(tree: Node, max_exact_bits: int) -> float:
+    """Worker process entry point for budgeted evaluation with a timeout"""
+    combinatorics.exact_bits_limit.set(max_exact_bits)
+    return tree.evaluate({})
 
 
 class CalculatorEngine:
-    """Main calculator engine that manages all operations"""
+    """Main calculator engine that manages all operations.
 
-    def __init__(self):
-        self.operations: Dict[str, Operation] = {}
-        self._initialize_operations()
-
-    def _initialize_operations(self):
-        """Initialize all calculator operations"""
-
-        # Basic arithmetic operations
-        basic_ops = [
-            BasicOperation("addition", "+", operator.add),
-            BasicOperation("subtraction", "-", operator.sub),
-            BasicOperation("multiplication", "*", operator.mul),
-            BasicOperation("division", "/", operator.truediv),
-            BasicOperation("modulo", "%", operator.mod),
-            BasicOperation("power", "**", operator.pow)
-        ]
-
-        # Power operation
-        power_op = PowerOperation()
-
-        # Scientific/Mathematical operations
-        scientific_ops = [
-            UnaryOperation("square_root", "sqrt", OperationType.SCIENTIFIC, math.sqrt),
-            UnaryOperation("absolute", "abs", OperationType.SCIENTIFIC, abs),
-            UnaryOperation("factorial", "!", OperationType.SCIENTIFIC, lambda x: math.factorial(int(x))),
-            UnaryOperation("natural_log", "ln", OperationType.LOGARITHMIC, math.log),
-            UnaryOperation("log_base_10", "log", OperationType.LOGARITHMIC, math.log10),
-            UnaryOperation("exponential", "exp", OperationType.SCIENTIFIC, math.exp),
-            UnaryOperation("ceiling", "ceil", OperationType.SCIENTIFIC, math.ceil),
-            UnaryOperation("floor", "floor", OperationType.SCIENTIFIC, math.floor)
-        ]
-
-        # Add all operations to the operations dictionary
-        all_operations = basic_ops + [power_op] + scientific_ops
-
-        for op in all_operations:
-            self.operations[op.symbol] = op
-            self.operations[op.name] = op
+    Factorials, nCr and nPr whose results would exceed max_exact_bits are
+    approximated instead of computed exactly (see combinatorics).
+    """
+
+    def __init__(self, cache_size: int = 1024, budget: Optional[EvaluationBudget] = None, profile: bool = False,
+                 max_exact_bits: int = combinatorics.MAX_EXACT_BITS):
+        self.operations: Mapping[str, Operation] = OPERATIONS
+        self.constants: Mapping[str, float] = CONSTANTS
+        self.budget = budget
+        self.max_exact_bits = max_exact_bits
+        self.profile = EngineStats() if profile else None
+        self._cache = ExpressionCache(cache_size)
+        self._pool = None
 
     def calculate(self, expression: str) -> float:
         """Calculate a mathematical expression"""
@@ -150,44 +1193,166 @@ class CalculatorEngine:
         except Exception as e:
             print(f"Error: {str(e)}")
 
+    def parse(self, expr: str) -> "Node":
+        """Parse an expression into an expression tree, reusing cached trees"""
+        key = " ".join(expr.split())
+        node = self._cache.get(key)
+        if node is None:
+            node = Parser(tokenize(key), self.operations, self.constants).parse()
+            self._cache.put(key, node)
+        return node
+
+    def evaluate(self, expr: str) -> float:
+        """Evaluate an expression, raising on error instead of printing like calculate"""
+        return self._evaluate_expression(expr)
+
     def _evaluate_expression(self, expr: str) -> float:
-        expr = expr.strip()
-        # 1) Function call? e.g. sqrt(3)
-        func_match = re.fullmatch(r'([a-zA-Z_]+)\(([-\d\.]+)\)', expr)
-        if func_match:
-            sym, val = func_match.groups()
-            val = float(val)
-            op = self.operations.get(sym)
-            if not op or not isinstance(op, UnaryOperation):
-                raise ValueError(f"Unknown unary op {sym}")
-            return op.execute(val)
-
-        # 2) Factorial postfix? e.g. 5!
-        fact_match = re.fullmatch(r'([-\d\.]+)!', expr)
-        if fact_match:
-            val = float(fact_match.group(1))
-            op = self.operations.get("!")
-            return op.execute(val)
-
-        # 3) Binary op? e.g. 2+3, 3**2
-        #    Sort symbols by length to match '**' before '*'
-        syms = sorted(self.operations.keys(), key=len, reverse=True)
-        for sym in syms:
-            if sym in ["+", "-", "*", "/", "%", "**"]:
-                parts = expr.split(sym)
-                if len(parts) == 2:
-                    a, b = map(float, parts)
-                    op = self.operations[sym]
-                    return op.execute(a, b)
-
-        raise ValueError(f"Could not parse expression: {expr}")
+        if self.profile is not None:
+            return self._evaluate_profiled(expr)
+        return self._execute(self.parse(expr))
+
+    def _evaluate_profiled(self, expr: str) -> float:
+        profile = self.profile
+        start = time.perf_counter()
+        try:
+            tree = self.parse(expr)
+            parsed = time.perf_counter()
+            profile.parse.record(parsed - start)
+            result = self._execute(tree)
+            profile.execute.record(time.perf_counter() - parsed)
+        except Exception as e:
+            profile.errors[type(e).__name__] += 1
+            raise
+        profile.operation_calls.update(op.name for op in tree.operations())
+        return result
+
+    def _execute(self, tree: Node) -> float:
+        max_exact_bits = self.max_exact_bits
+        if self.budget is not None:
+            tree, max_exact_bits = self._within_budget(tree)
+            if self.budget.timeout is not None:
+                return self._evaluate_with_timeout(tree, max_exact_bits)
+        token = combinatorics.exact_bits_limit.set(max_exact_bits)
+        try:
+            return tree.evaluate({})
+        finally:
+            combinatorics.exact_bits_limit.reset(token)
+
+    def _within_budget(self, tree: Node) -> Tuple[Node, int]:
+        """Return the tree to evaluate under the budget and its exact-size limit, or raise if it is rejected"""
+        cost = tree.estimate().cost
+        if cost <= self.budget.max_bits:
+            return tree, self.max_exact_bits
+        if self.budget.on_exceed == "reject":
+            raise OverflowError(f"Expression exceeds evaluation budget "
+                                f"(about {cost:.3g} bits, limit {self.budget.max_bits})")
+        # Combinatorics truncate float arguments, so the budget also caps their exact results
+        return tree.as_float(), min(self.max_exact_bits, self.budget.max_bits)
+
+    def _evaluate_with_timeout(self, tree: Node, max_exact_bits: int) -> float:
+        import multiprocessing
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(1)
+        try:
+            return self._pool.apply_async(_evaluate_tree, (tree, max_exact_bits)).get(self.budget.timeout)
+        except multiprocessing.TimeoutError:
+            # The worker is stuck in the computation; killing it is the only way to stop it
+            self.close()
+            raise TimeoutError(f"Evaluation exceeded {self.budget.timeout}s time limit") from None
+
+    def close(self):
+        """Stop the evaluation worker process, if one was started for timeouts"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def compile(self, expr: str) -> CompiledExpression:
+        """Compile an expression into a reusable callable with constant subexpressions folded"""
+        return CompiledExpression(expr, self.parse(expr))
+
+    def evaluate_array(self, expr: str, **variables) -> "np.ndarray":
+        """Evaluate an expression element-wise over arrays, e.g. evaluate_array("sqrt(x) + y**2", x=xs, y=ys).
+
+        Domain errors (sqrt of negatives, division by zero, ...) yield NaN in the
+        affected positions instead of raising. An expression that uses none of
+        the variables is broadcast (read-only) to the shape of the inputs.
+        """
+        _load_numpy()
+        env = {name: np.asarray(values, dtype=np.float64) for name, values in variables.items()}
+        tree = self.parse(expr)
+        with np.errstate(all="ignore"):
+            result = np.asarray(tree.evaluate_array(env), dtype=np.float64)
+        if not tree.variables():
+            result = np.broadcast_to(result, np.broadcast(*env.values()).shape if env else ())
+        return result
+
+    def _functions_of(self, expr: str, var: str, variables: Dict[str, float]) -> Tuple[Callable, Callable]:
+        """Scalar and vectorized functions of one variable for the numerical commands"""
+        _load_numpy()
+        compiled = self.compile(expr)
+
+        def scalar(x: float) -> float:
+            return compiled(**variables, **{var: x})
+
+        def vectorized(xs: "np.ndarray") -> "np.ndarray":
+            return np.broadcast_to(self.evaluate_array(expr, **variables, **{var: xs}), xs.shape)
+
+        def pointwise(xs: "np.ndarray") -> "np.ndarray":
+            ys = np.empty(xs.shape)
+            for i, x in enumerate(xs.flat):
+                try:
+                    ys.flat[i] = scalar(float(x))
+                except (ValueError, ZeroDivisionError, OverflowError):
+                    ys.flat[i] = np.nan
+            return ys
+
+        # Aggregates may take ranges, which have no array form; sample them one point at a time
+        if any(isinstance(op, AggregateOperation) for op in self.parse(expr).operations()):
+            return scalar, pointwise
+        return scalar, vectorized
+
+    def solve(self, expr: str, var: str, lo: float, hi: float, **variables) -> float:
+        """Find x in [lo, hi] with expr == 0, e.g. solve("x**2 - 2", "x", 0, 2)"""
+        import numerics
+        scalar, vectorized = self._functions_of(expr, var, variables)
+        return numerics.find_root(scalar, vectorized, lo, hi)
 
+    def integrate(self, expr: str, var: str, a: float, b: float, **variables) -> float:
+        """Definite integral of expr over var from a to b"""
+        import numerics
+        _, vectorized = self._functions_of(expr, var, variables)
+        return numerics.integrate(vectorized, a, b)
 
+    def diff(self, expr: str, var: str, at: float, **variables) -> float:
+        """Derivative of expr with respect to var at the given point"""
+        import numerics
+        _, vectorized = self._functions_of(expr, var, variables)
+        return numerics.differentiate(vectorized, at)
+
+    def summarize(self, source: Union[str, TextIO, Iterable[float]],
+                  percentiles: Iterable[float] = (50, 90, 99)) -> Dict[str, Optional[float]]:
+        """Single-pass statistics over a file path, text stream or iterable of numbers"""
+        if isinstance(source, str):
+            with open(source, encoding="utf-8") as stream:
+                return aggregates.summarize(stream, percentiles)
+        return aggregates.summarize(source, percentiles)
+
+    def cache_info(self) -> Dict:
+        """Return hit/miss statistics for the compiled-expression cache"""
+        return self._cache.info()
+
+    def stats(self) -> Dict:
+        """Profiling counters as a JSON-serializable dict; requires CalculatorEngine(profile=True)"""
+        if self.profile is None:
+            raise ValueError("Profiling is disabled; create the engine with profile=True")
+        return self.profile.snapshot(self.cache_info())
 
     def list_operations(self, operation_type: OperationType = None) -> Dict:
         """List all available operations, optionally filtered by type"""
         if operation_type:
-            return {operation_type: [f"{op.symbol}: {op.name}" for op in self.operations.values() 
+            # Each operation is registered under both its symbol and its name
+            unique_ops = dict.fromkeys(self.operations.values())
+            return {operation_type: [f"{op.symbol}: {op.name}" for op in unique_ops
                    if op.operation_type == operation_type]}
         else:
             # Group by type
@@ -200,11 +1365,94 @@ class CalculatorEngine:
             return grouped
 
 
+# Integers longer than this are abbreviated when printed (Python refuses str() past ~4300 digits)
+_MAX_PRINT_BITS = 14000
+
+
+def format_scientific(value: float, precision: int = 2) -> str:
+    """Scientific notation that also works for integers beyond float range"""
+    if isinstance(value, int) and value.bit_length() > 1000:
+        log10 = math.log10(abs(value))
+        exponent = int(log10)
+        sign = "-" if value < 0 else ""
+        return f"{sign}{10 ** (log10 - exponent):.{precision}f}e+{exponent}"
+    return f"{value:.{precision}e}"
+
+
+def format_result(value: float) -> Union[float, str]:
+    """Return value unchanged unless it is an integer too long to print in full or an approximation"""
+    if isinstance(value, Decimal):
+        return f"{value.normalize(_decimal_context(value)):e} (approximate)"
+    if isinstance(value, int) and value.bit_length() > _MAX_PRINT_BITS:
+        return f"{format_scientific(value, 10)} ({int(math.log10(abs(value))) + 1} digits)"
+    return value
+
+
+# (line number, expression, result, error message)
+BatchRow = Tuple[int, str, Optional[float], Optional[str]]
+
+_worker_engine: Optional[CalculatorEngine] = None
+_worker_max_exact_bits = combinatorics.MAX_EXACT_BITS
+
+
+def evaluate_lines(engine: CalculatorEngine, lines: Iterable[Tuple[int, str]]) -> List[BatchRow]:
+    """Evaluate numbered expressions, capturing each line's error instead of raising"""
+    rows = []
+    for line_no, expr in lines:
+        try:
+            result = engine.evaluate(expr)
+            if not isinstance(result, NUMBER_TYPES):
+                raise TypeError(f"result is a {type(result).__name__}, not a number")
+            rows.append((line_no, expr, format_result(result), None))
+        except Exception as e:
+            rows.append((line_no, expr, None, f"{type(e).__name__}: {e}"))
+    return rows
+
+
+def _json_result(result: Union[float, str, None]) -> Union[float, str, None]:
+    """inf and nan as strings, since JSON has no literals for them"""
+    if isinstance(result, float) and not math.isfinite(result):
+        return str(result)
+    return result
+
+
+def _evaluate_chunk(lines: List[Tuple[int, str]]) -> List[BatchRow]:
+    """Process pool entry point; each worker keeps one engine so its parse cache stays warm"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = CalculatorEngine(budget=EvaluationBudget(max_bits=_worker_max_exact_bits),
+                                          max_exact_bits=_worker_max_exact_bits)
+    return evaluate_lines(_worker_engine, lines)
+
+
+def _start_worker(max_exact_bits: int):
+    """Process pool initializer giving workers the parent engine's settings"""
+    global _worker_max_exact_bits
+    _worker_max_exact_bits = max_exact_bits
+
+
+def _split_arguments(text: str) -> List[str]:
+    """Split on commas that are not nested inside parentheses"""
+    args, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            args.append(text[start:i])
+            start = i + 1
+    args.append(text[start:])
+    return [arg.strip() for arg in args]
+
+
 class CalculatorCLI:
     """Command line interface for the calculator"""
 
-    def __init__(self):
-        self.calculator = CalculatorEngine()
+    def __init__(self, profile: bool = False, max_exact_bits: int = combinatorics.MAX_EXACT_BITS):
+        # Typed input is untrusted, so huge exact intermediates such as 9**9**9 fall back to floats
+        self.calculator = CalculatorEngine(budget=EvaluationBudget(max_bits=max_exact_bits), profile=profile,
+                                           max_exact_bits=max_exact_bits)
         self.running = True
 
     def display_welcome(self):
@@ -215,11 +1463,14 @@ class CalculatorCLI:
         print("Welcome to the Calculator!")
         print("\n FEATURES:")
         print("• Basic arithmetic: +, -, *, /, %,**")
-        print("• Scientific: sqrt, abs, factorial(!), exp, ceil, floor")
+        print("• Scientific: sqrt, abs, factorial(!), exp, ceil, floor, sin, cos, tan, asin, acos, atan")
         print("• Logarithmic: ln (natural log), log (base 10)")
+        print("• Statistics: sum, mean, var, stddev, min, max, median, percentile")
         print("\n COMMANDS:")
         print("• 'help' - Show detailed help")
         print("• 'ops' - List all operations by category")
+        print("• 'stats' - Show profiling counters (start with --profile); 'stats json' for raw JSON")
+        print("• 'solve(expr, x, lo, hi)', 'integrate(expr, x, a, b)', 'diff(expr, x, at)'")
         print("• 'quit' or 'exit' - Exit calculator")
         print("=" * 70)
 
@@ -238,7 +1489,11 @@ class CalculatorCLI:
         print("• ^ or ** (power)")
         print("• sqrt(), abs(), exp(), ln(), log()")
         print("• factorial: 5! or factorial(5)")
+        print("• combinatorics: nCr(10, 3), nPr(10, 3)")
+        print("• log-space: lnfact(100000), lgamma(x), lnCr(n, r)")
+        print("• statistics: mean(1, 2, 3), sum(range(1, 101)), percentile(90, range(1, 1000))")
         print("• ceil(), floor(), rad(), deg()")
+        print("• sin(), cos(), tan(), asin(), acos(), atan()")
         print("-" * 50)
 
     def list_operations(self):
@@ -275,16 +1530,21 @@ class CalculatorCLI:
                 elif user_input.lower() == 'ops':
                     self.list_operations()
                     continue
+                elif user_input.lower() in ['stats', 'stats json']:
+                    self.display_stats(as_json=user_input.lower() == 'stats json')
+                    continue
 
                 # Calculate expression
-                result = self.calculator.calculate(user_input)
-                print(f" Result: {result}")
+                result = self._numeric_command(user_input)
+                if result is None:
+                    result = self.calculator.calculate(user_input)
+                print(f" Result: {format_result(result)}")
 
                 # Format large numbers nicely
                 if abs(result) > 1000000:
-                    print(f" Scientific: {result:.2e}")
+                    print(f" Scientific: {format_scientific(result)}")
                 elif abs(result) < 0.001 and result != 0:
-                    print(f" Scientific: {result:.2e}")
+                    print(f" Scientific: {format_scientific(result)}")
 
             except KeyboardInterrupt:
                 print("\n\n Goodbye! Thanks for using the calculator!")
@@ -296,11 +1556,139 @@ class CalculatorCLI:
             except Exception as e:
                 print(f" Unexpected error: {e}")
 
+    def display_stats(self, as_json: bool = False):
+        """Display profiling counters for this session"""
+        if self.calculator.profile is None:
+            print(" Profiling is off. Restart with --profile to collect stats.")
+            return
+        stats = self.calculator.stats()
+        if as_json:
+            print(json.dumps(stats, indent=2))
+            return
+        print("\n PROFILING STATS")
+        print("-" * 50)
+        print(f" Evaluations: {stats['evaluations']}")
+        for phase in ("parse", "execute"):
+            timing = stats[phase]
+            print(f" {phase.title():8} total {timing['total_ms']:.3f} ms | "
+                  f"p50 {timing['p50_ms']:.4f} ms | p99 {timing['p99_ms']:.4f} ms")
+        cache = stats["cache"]
+        print(f" Cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%})")
+        if stats["operations"]:
+            print(" Operations: " + ", ".join(f"{name}={count}" for name, count in stats["operations"].items()))
+        if stats["errors"]:
+            print(" Errors: " + ", ".join(f"{name}={count}" for name, count in stats["errors"].items()))
+        print("-" * 50)
+
+    def _numeric_command(self, text: str) -> Optional[float]:
+        """Run solve(...), integrate(...) or diff(...) typed at the prompt; None for other input"""
+        match = re.fullmatch(r"(solve|integrate|diff)\s*\((.*)\)", text)
+        if not match:
+            return None
+        command, inner = match.groups()
+        args = _split_arguments(inner)
+        expected = 3 if command == "diff" else 4
+        if len(args) != expected:
+            raise ValueError(f"{command}() takes {expected} arguments but {len(args)} were given")
+        expr, var, *points = args
+        points = [self.calculator.evaluate(point) for point in points]
+        return getattr(self.calculator, command)(expr, var.strip(), *points)
+
+    def run_batch(self, source: TextIO, output: TextIO, fmt: str = "csv",
+                  workers: int = 1, chunk_size: int = 10000) -> Tuple[int, int]:
+        """Evaluate one expression per line from source and write results in input order.
 
-def main():
+        Blank lines are skipped but keep their line numbers. With workers > 1 chunks
+        are evaluated in a process pool, keeping at most two chunks per worker in
+        flight so memory stays bounded for arbitrarily large inputs. Returns the
+        number of expressions evaluated and how many of them failed.
+        """
+        numbered = ((n, line.strip()) for n, line in enumerate(source, 1) if line.strip())
+        chunks = iter(lambda: list(islice(numbered, chunk_size)), [])
+        write = self._batch_writer(output, fmt)
+        total = errors = 0
+
+        def emit(rows: List[BatchRow]):
+            nonlocal total, errors
+            total += len(rows)
+            errors += sum(1 for row in rows if row[3] is not None)
+            write(rows)
+
+        if workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                     initargs=(self.calculator.max_exact_bits,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_evaluate_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+        else:
+            for chunk in chunks:
+                emit(evaluate_lines(self.calculator, chunk))
+        output.flush()
+        return total, errors
+
+    @staticmethod
+    def _batch_writer(output: TextIO, fmt: str) -> Callable[[List[BatchRow]], None]:
+        """Return a function writing batch rows as CSV or JSON lines"""
+        if fmt == "csv":
+            writer = csv.writer(output)
+            writer.writerow(["line", "expression", "result", "error"])
+            return writer.writerows
+        if fmt == "jsonl":
+            def write(rows: List[BatchRow]):
+                output.write("".join(
+                    json.dumps({"line": n, "expression": expr, "result": _json_result(result), "error": error},
+                               allow_nan=False) + "\n"
+                    for n, expr, result, error in rows))
+            return write
+        raise ValueError(f"Unknown batch format: {fmt}")
+
+
+def main(argv: Optional[List[str]] = None):
     """Main function to run the calculator"""
-    calculator_cli = CalculatorCLI()
-    calculator_cli.run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Command line calculator")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="evaluate one expression per line from FILE ('-' for stdin) instead of running interactively")
+    parser.add_argument("-o", "--output", default="-", help="batch output file (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="batch output format")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for batch mode")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="expressions per worker chunk")
+    parser.add_argument("--profile", action="store_true",
+                        help="collect profiling counters ('stats' command; JSON on stderr after a batch run)")
+    parser.add_argument("--max-exact-bits", type=int, default=combinatorics.MAX_EXACT_BITS,
+                        help="largest factorial, nCr or nPr result computed exactly; bigger ones are approximated")
+    parser.add_argument("--summarize", metavar="FILE",
+                        help="print single-pass statistics for the numbers in FILE ('-' for stdin) as JSON")
+    args = parser.parse_args(argv)
+
+    calculator_cli = CalculatorCLI(profile=args.profile, max_exact_bits=args.max_exact_bits)
+    if args.summarize is not None:
+        source = sys.stdin if args.summarize == "-" else args.summarize
+        try:
+            summary = calculator_cli.calculator.summarize(source)
+        except (ValueError, OSError) as e:
+            # Unreadable files and non-numeric lines end with a message and a failing exit status
+            sys.exit(f"Error: {e}")
+        print(json.dumps(summary))
+        return
+    if args.batch is None:
+        calculator_cli.run()
+        return
+
+    with ExitStack() as stack:
+        source = sys.stdin if args.batch == "-" else stack.enter_context(open(args.batch, encoding="utf-8"))
+        output = sys.stdout if args.output == "-" else stack.enter_context(
+            open(args.output, "w", encoding="utf-8", newline=""))
+        total, errors = calculator_cli.run_batch(source, output, args.format, args.workers, args.chunk_size)
+    print(f"Evaluated {total} expressions ({errors} errors)", file=sys.stderr)
+    if args.profile:
+        # Worker processes keep their own engines, so only in-process evaluations are counted
+        print(json.dumps(calculator_cli.calculator.stats()), file=sys.stderr)
 
 if __name__ == "__main__":
     main()
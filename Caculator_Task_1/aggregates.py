@@ -0,0 +1,338 @@
+"""Single-pass statistics behind the calculator's aggregate operations
+
+RunningStats computes count, sum, mean, variance, min and max in one pass, so
+numbers can be streamed from files larger than memory. The mean and variance use
+Welford's algorithm and the sum uses compensated summation. NumPy arrays are
+reduced a whole array at a time and ranges use closed forms. Both are then
+combined with Chan's parallel update instead of being iterated element by
+element. P2Quantile estimates a percentile of a stream in constant memory.
+"""
+import math
+import re
+from bisect import bisect_right, insort
+from typing import Dict, Iterable, List, Optional, TextIO, Union
+
+
+class RunningStats:
+    """Streaming count, sum, mean, variance, min and max"""
+    __slots__ = ("count", "mean", "min", "max", "_m2", "_sum", "_compensation")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._m2 = 0.0
+        # Integer inputs keep the sum exact; floats switch to Neumaier summation
+        self._sum = 0
+        self._compensation = 0
+
+    def push(self, x: float):
+        """Add one number"""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self._add(x)
+
+    def update(self, values):
+        """Add a number, a range, a NumPy array or any iterable of these"""
+        if isinstance(values, (int, float)):
+            self.push(values)
+        elif isinstance(values, range):
+            self._merge_range(values)
+        elif hasattr(values, "dtype"):
+            self._merge_array(values)
+        else:
+            for value in values:
+                if isinstance(value, (int, float)):
+                    self.push(value)
+                else:
+                    self.update(value)
+
+    def merge(self, other: "RunningStats"):
+        """Combine with statistics computed over a separate set of values"""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add(other._sum)
+        self._add(other._compensation)
+
+    def _add(self, x: float):
+        total = self._sum + x
+        if abs(self._sum) >= abs(x):
+            self._compensation += (self._sum - total) + x
+        else:
+            self._compensation += (x - total) + self._sum
+        self._sum = total
+
+    def _merge_range(self, values: range):
+        if not values:
+            return
+        first, last, n = values[0], values[-1], len(values)
+        chunk = RunningStats()
+        chunk.count = n
+        chunk.mean = (first + last) / 2
+        chunk.min, chunk.max = min(first, last), max(first, last)
+        chunk._m2 = values.step * values.step * n * (n * n - 1) / 12
+        chunk._sum = n * (first + last) // 2
+        self.merge(chunk)
+
+    def _merge_array(self, values):
+        values = values.ravel()
+        if values.size == 0:
+            return
+        chunk = RunningStats()
+        chunk.count = int(values.size)
+        chunk.mean = float(values.mean())
+        chunk._m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.min, chunk.max = float(values.min()), float(values.max())
+        chunk._sum = float(values.sum())
+        self.merge(chunk)
+
+    @property
+    def total(self) -> float:
+        return self._sum + self._compensation
+
+    def variance(self, ddof: int = 1) -> float:
+        """Sample variance by default; ddof=0 gives the population variance"""
+        if self.count - ddof <= 0:
+            raise ValueError(f"Variance needs at least {ddof + 1} values")
+        return self._m2 / (self.count - ddof)
+
+    def stddev(self, ddof: int = 1) -> float:
+        return math.sqrt(self.variance(ddof))
+
+
+class P2Quantile:
+    """Constant-memory streaming estimate of one percentile (Jain and Chlamtac's P-square algorithm)"""
+    __slots__ = ("p", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, percent: float):
+        p = percent / 100
+        self.p = p
+        self._heights: List[float] = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def push(self, x: float):
+        q, n = self._heights, self._positions
+        if len(q) < 5:
+            insort(q, x)
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        # Move the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self) -> float:
+        if not self._heights:
+            raise ValueError("Percentile of no values")
+        if len(self._heights) < 5:
+            return _sorted_percentile(self._heights, self.p * 100)
+        return self._heights[2]
+
+
+def _sorted_percentile(values: List[float], percent: float) -> float:
+    """Linearly interpolated percentile of sorted values (NumPy's default method)"""
+    index = (len(values) - 1) * percent / 100
+    lower = math.floor(index)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (index - lower)
+
+
+def _stats(values: Iterable) -> RunningStats:
+    stats = RunningStats()
+    for value in values:
+        stats.update(value)
+    if stats.count == 0:
+        raise ValueError("Aggregate of no values")
+    return stats
+
+
+def total(*values) -> float:
+    return _stats(values).total
+
+
+def mean(*values) -> float:
+    return _stats(values).mean
+
+
+def variance(*values) -> float:
+    return _stats(values).variance()
+
+
+def stddev(*values) -> float:
+    return _stats(values).stddev()
+
+
+def minimum(*values) -> float:
+    return _stats(values).min
+
+
+def maximum(*values) -> float:
+    return _stats(values).max
+
+
+def percentile(percent: float, *values) -> float:
+    """Exact percentile of the given values, ranges and arrays"""
+    if not 0 <= percent <= 100:
+        raise ValueError("Percentile must be between 0 and 100")
+    if len(values) == 1 and isinstance(values[0], range):
+        evenly_spaced = values[0]
+        if not evenly_spaced:
+            raise ValueError("Percentile of no values")
+        # Interpolating between evenly spaced values stays on the same line
+        lowest = min(evenly_spaced[0], evenly_spaced[-1])
+        return lowest + abs(evenly_spaced.step) * (len(evenly_spaced) - 1) * percent / 100
+    if any(hasattr(value, "dtype") for value in values):
+        import numpy as np
+        flat = np.concatenate([np.ravel(np.asarray(value, dtype=np.float64)) for value in values])
+        if flat.size == 0:
+            raise ValueError("Percentile of no values")
+        return float(np.percentile(flat, percent))
+    numbers, ranges = [], []
+    _split_ranges(values, numbers, ranges)
+    numbers.sort()
+    count = len(numbers) + sum(len(r) for r in ranges)
+    if not count:
+        raise ValueError("Percentile of no values")
+    index = (count - 1) * percent / 100
+    lower = math.floor(index)
+    low = _kth_smallest(lower, numbers, ranges)
+    if lower == index:
+        return low
+    return low + (_kth_smallest(lower + 1, numbers, ranges) - low) * (index - lower)
+
+
+def _split_ranges(values: Iterable, numbers: List[float], ranges: List[range]):
+    """Collect ranges, as ascending ranges, apart from the other numbers so they are never expanded"""
+    for value in values:
+        if isinstance(value, (int, float)):
+            numbers.append(value)
+        elif isinstance(value, range):
+            if value:
+                ranges.append(value if value.step > 0 else value[::-1])
+        else:
+            _split_ranges(value, numbers, ranges)
+
+
+def _count_at_most(x: float, numbers: List[float], ranges: List[range]) -> int:
+    count = bisect_right(numbers, x)
+    for r in ranges:
+        if x >= r.start:
+            offset = x - r.start
+            steps = offset // r.step if isinstance(offset, int) else math.floor(offset / r.step)
+            count += min(len(r), steps + 1)
+    return count
+
+
+def _kth_smallest(k: int, numbers: List[float], ranges: List[range]) -> float:
+    """The k-th smallest (from 0) of sorted numbers and ascending ranges, by binary search on counts"""
+    # The smallest listed number and the smallest integer with more than k values at or below them;
+    # the answer is whichever is smaller
+    lo, hi = 0, len(numbers)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _count_at_most(numbers[mid], numbers, ranges) > k:
+            hi = mid
+        else:
+            lo = mid + 1
+    best = numbers[lo] if lo < len(numbers) else math.inf
+    if ranges:
+        lo, hi = min(r.start for r in ranges), max(r[-1] for r in ranges)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _count_at_most(mid, numbers, ranges) > k:
+                hi = mid
+            else:
+                lo = mid + 1
+        if _count_at_most(lo, numbers, ranges) > k:
+            best = min(best, lo)
+    return best
+
+
+def median(*values) -> float:
+    return percentile(50, *values)
+
+
+def integer_range(*args: float) -> range:
+    """range() accepting integral floats, as produced by calculator literals like 1e3"""
+    if not 1 <= len(args) <= 3:
+        raise ValueError(f"range() takes 1 to 3 arguments but {len(args)} were given")
+    if any(not isinstance(a, int) and not a.is_integer() for a in args):
+        raise ValueError("range() arguments must be integers")
+    return range(*map(int, args))
+
+
+_NUMBER_SEPARATORS = re.compile(r"[\s,;]+")
+
+
+def read_numbers(stream: TextIO) -> Iterable[float]:
+    """Yield numbers from a text stream, separated by whitespace, commas or semicolons"""
+    for line in stream:
+        for field in _NUMBER_SEPARATORS.split(line.strip()):
+            if field:
+                yield float(field)
+
+
+def summarize(values: Union[TextIO, Iterable[float]], percentiles: Iterable[float] = (50, 90, 99)
+              ) -> Dict[str, Optional[float]]:
+    """One pass over a stream of numbers; percentiles are P-square estimates"""
+    if hasattr(values, "read"):
+        values = read_numbers(values)
+    stats = RunningStats()
+    estimators = [P2Quantile(p) for p in percentiles]
+    for value in values:
+        stats.push(value)
+        for estimator in estimators:
+            estimator.push(value)
+    if stats.count == 0:
+        raise ValueError("Aggregate of no values")
+    summary = {
+        "count": stats.count,
+        "sum": stats.total,
+        "mean": stats.mean,
+        "var": stats.variance() if stats.count > 1 else None,
+        "stddev": stats.stddev() if stats.count > 1 else None,
+        "min": stats.min,
+        "max": stats.max,
+    }
+    for estimator in estimators:
+        summary[f"p{estimator.p * 100:g}"] = estimator.value()
+    return summary
@@ -0,0 +1,128 @@
+"""Combinatorics helpers behind the calculator's scientific operations
+
+Exact results are computed with math.factorial/comb/perm, which use
+divide-and-conquer products internally, and small ones are memoized. Before
+computing, the size of the result is estimated from the log-gamma function. If
+it would exceed the exact-size limit, the result is approximated from its
+logarithm (Stirling's series for factorials) instead: as a float when it fits,
+otherwise as a decimal.Decimal holding the significant digits and the exponent,
+e.g. 100000! = Decimal('2.824229408E+456573'). The log-space functions
+(log_factorial, log_comb) handle arguments of any size.
+
+The limit is MAX_EXACT_BITS unless a max_exact_bits argument is given or
+exact_bits_limit is set for the current context, as CalculatorEngine does.
+"""
+import math
+from contextvars import ContextVar
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, Union
+
+# Largest result, in bits, that is computed exactly (about 315,000 decimal digits)
+MAX_EXACT_BITS = 1 << 20
+
+# Overrides MAX_EXACT_BITS for the current thread or task while it is set
+exact_bits_limit: ContextVar[Optional[int]] = ContextVar("exact_bits_limit", default=None)
+
+# Exact results up to this size are memoized, so the caches hold at most a few MiB
+_CACHED_BITS = 1 << 14
+
+# n! for n up to here is exactly representable as a float, so Stirling is never needed
+_FLOAT_EXACT_LIMIT = 170
+
+_LN2 = math.log(2)
+
+
+def log_factorial(n: float) -> float:
+    """Natural log of n!, valid for arbitrarily large n"""
+    return math.lgamma(n + 1)
+
+
+def log_comb(n: float, r: float) -> float:
+    """Natural log of n choose r"""
+    return log_factorial(n) - log_factorial(r) - log_factorial(n - r)
+
+
+def log_perm(n: float, r: float) -> float:
+    """Natural log of n!/(n-r)!"""
+    return log_factorial(n) - log_factorial(n - r)
+
+
+def stirling_log_factorial(n: float) -> float:
+    """Stirling's series for ln(n!), accurate to ~1e-10 relative error for n >= 10"""
+    if n < 10:
+        return log_factorial(n)
+    return n * math.log(n) - n + 0.5 * math.log(2 * math.pi * n) + 1 / (12 * n) - 1 / (360 * n ** 3)
+
+
+def approximate(log_value: float) -> Union[float, Decimal]:
+    """The number whose natural log is log_value: a float if it fits, otherwise a Decimal"""
+    try:
+        return math.exp(log_value)
+    except OverflowError:
+        pass
+    log10 = log_value / math.log(10)
+    exponent = math.floor(log10)
+    # log10 carries about 16 significant digits, and those before the point are spent on the exponent
+    digits = max(1, 15 - len(str(exponent)))
+    return Decimal(f"{10 ** (log10 - exponent):.{digits}f}E{exponent}")
+
+
+def _exceeds_limit(log_value: float, max_exact_bits: int = None) -> bool:
+    if max_exact_bits is None:
+        max_exact_bits = exact_bits_limit.get()
+    limit = MAX_EXACT_BITS if max_exact_bits is None else max_exact_bits
+    return log_value / _LN2 > limit
+
+
+def _exact(function, cached, log_value: float, *args) -> int:
+    """function(*args), memoized through cached when the result is small"""
+    if log_value / _LN2 <= _CACHED_BITS:
+        return cached(*args)
+    return function(*args)
+
+
+@lru_cache(maxsize=256)
+def _exact_factorial(n: int) -> int:
+    return math.factorial(n)
+
+
+@lru_cache(maxsize=1024)
+def _exact_comb(n: int, r: int) -> int:
+    return math.comb(n, r)
+
+
+@lru_cache(maxsize=1024)
+def _exact_perm(n: int, r: int) -> int:
+    return math.perm(n, r)
+
+
+def factorial(n: float, max_exact_bits: int = None):
+    """n! exactly when small enough, otherwise a Stirling approximation (see approximate())"""
+    n = int(n)
+    log_value = log_factorial(n)
+    if n <= _FLOAT_EXACT_LIMIT or not _exceeds_limit(log_value, max_exact_bits):
+        return _exact(math.factorial, _exact_factorial, log_value, n)
+    return approximate(stirling_log_factorial(n))
+
+
+def comb(n: float, r: float, max_exact_bits: int = None):
+    """Number of ways to choose r items from n without order (nCr)"""
+    n, r = int(n), int(r)
+    if r > n:
+        return 0
+    log_value = log_comb(n, r)
+    if not _exceeds_limit(log_value, max_exact_bits):
+        return _exact(math.comb, _exact_comb, log_value, n, r)
+    return approximate(log_value)
+
+
+def perm(n: float, r: float, max_exact_bits: int = None):
+    """Number of ordered arrangements of r items from n (nPr)"""
+    n, r = int(n), int(r)
+    if r > n:
+        return 0
+    log_value = log_perm(n, r)
+    if not _exceeds_limit(log_value, max_exact_bits):
+        return _exact(math.perm, _exact_perm, log_value, n, r)
+    return approximate(log_value)
@@ -0,0 +1,77 @@
+import math
+
+import pytest
+
+from Calculator import CalculatorEngine, format_result
+
+
+@pytest.fixture
+def engine():
+    return CalculatorEngine()
+
+
+@pytest.mark.parametrize("expr", [
+    "max(x, 1)", "min(x, 1, 2)", "sum(x, 1)", "mean(x, 2)", "var(x, 1, 3)", "stddev(x, 0)",
+    "median(x, 1, 4)", "percentile(30, x, 1, 2)", "percentile(x * 10, 1, 2, 3)", "max(x, 1) + x * 2",
+])
+def test_evaluate_array_aggregates_match_compile(engine, expr):
+    np = pytest.importorskip("numpy")
+    xs = np.array([-5.0, 0.0, 1.0, 2.0, 3.0, 7.5])
+    compiled = engine.compile(expr)
+    expected = []
+    for x in xs:
+        try:
+            expected.append(float(compiled(x=x)))
+        except ValueError:
+            expected.append(math.nan)
+    np.testing.assert_allclose(engine.evaluate_array(expr, x=xs), expected)
+
+
+def test_numerical_commands_with_aggregates(engine):
+    pytest.importorskip("numpy")
+    assert engine.integrate("max(x, 1)", "x", 0, 2) == pytest.approx(2.5)
+    assert engine.diff("max(x, 1)", "x", 2) == pytest.approx(1.0)
+    assert engine.solve("max(x, 1) - 2", "x", 0, 5) == pytest.approx(2.0)
+    assert engine.solve("sum(range(1, 4), x) - 10", "x", 0, 10) == pytest.approx(4.0)
+    assert engine.integrate("mean(range(1, 4), x)", "x", 0, 2) == pytest.approx(3.5)
+
+
+@pytest.mark.parametrize("expr", ["100000!!", "nCr(100000!, 2)", "100000! // 7", "100000! % 7", "sin(100000!)"])
+def test_approximations_reject_exact_operations(engine, expr):
+    with pytest.raises(ValueError, match="too large for exact arithmetic"):
+        engine.evaluate(expr)
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("100000!", "2.824229408e+456573 (approximate)"),
+    ("100000! + 1", "2.824229408e+456573 (approximate)"),
+    ("100000! / 3", "9.414098027e+456572 (approximate)"),
+    ("sqrt(100000!)", "5.314347945e+228286 (approximate)"),
+    ("abs(-100000!)", "2.824229408e+456573 (approximate)"),
+    ("-nCr(10**7, 10**6)", "-1.09354046e+1411814 (approximate)"),
+])
+def test_approximation_arithmetic_keeps_significant_digits(engine, expr, expected):
+    assert format_result(engine.evaluate(expr)) == expected
+
+
+def test_approximations_narrow_to_floats(engine):
+    assert engine.evaluate("ln(100000!)") == pytest.approx(1051299.22, abs=0.01)
+    assert engine.evaluate("100000! / 100000!") == 1.0
+    assert format_result(engine.compile("x! + 1")(x=100000)) == "2.824229408e+456573 (approximate)"
+
+
+def test_summarize_reports_bad_input(tmp_path):
+    from Calculator import main
+    (tmp_path / "numbers.txt").write_text("1\nabc\n")
+    for path in [tmp_path / "numbers.txt", tmp_path / "missing.txt"]:
+        with pytest.raises(SystemExit) as exited:
+            main(["--summarize", str(path)])
+        assert str(exited.value.code).startswith("Error: ")
+
+
+def test_cli_engine_has_a_budget():
+    from Calculator import CalculatorCLI
+    engine = CalculatorCLI(max_exact_bits=4096).calculator
+    assert engine.budget is not None and engine.budget.max_bits == 4096
+    with pytest.raises(OverflowError):
+        engine.evaluate("9**9**9")
@@ -1,16 +1,27 @@
-
+"""Scrape the top and latest headlines from Indian Express into text files
+
+By default the page is downloaded with a plain HTTP request and the headline
+block is found with lxml, which takes well under a second. Chrome (through
+Selenium) is only started with --browser, or when the downloaded HTML does not
+contain the headline block because the site rendered it with JavaScript.
+--html reads a saved page instead of the live site, e.g. the sample_page.html
+fixture. To follow several sites at once, use headline_crawler.py.
+"""
+import argparse
+import gzip
 import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+import urllib.request
+from typing import List, Optional, Tuple
+
+from headline_crawler import USER_AGENT, element_lines, load_lxml_html
 
 
 NEWS_URL = "https://indianexpress.com/"
 TOP_HEADLINES_OUTPUT_FILE = "news_topheadlines.txt"
 LATEST_HEADLINES_OUTPUT_FILE = "news_latestheadlines.txt"
-HEADLINE_FUllXPATH = "/html/body/div[3]/div[6]/div/div[2]/div[5]"  
+HEADLINE_FUllXPATH = "/html/body/div[3]/div[6]/div/div[2]/div[5]"
 WAIT_TIME = 3
+CHROMEDRIVER_PATH = "C:/Driver/chromedriver.exe"
 
 
 def save_to_file(headlines, filename,storyType):
@@ -21,35 +32,97 @@ def save_to_file(headlines, filename,storyType):
             f.write(f"{idx}. {title}\n")
 
 
-driver = webdriver.Chrome(service = Service("C:/Driver/chromedriver.exe"))
-time.sleep(WAIT_TIME)
-driver.get(NEWS_URL)
-time.sleep(WAIT_TIME)
-
-
-
-headlines = driver.find_element(By.XPATH,HEADLINE_FUllXPATH)
-top = headlines.find_element(By.XPATH, "./div[1]").text.split("\n")
-latest = headlines.find_element(By.XPATH, "./div[2]").text.split("\n")
-temp = []
-for i in range(0,len(top)):
-    if top[i].isupper():
-            continue
-    temp.append(top[i])
-
-if temp:
-    save_to_file(t, TOP_HEADLINES_OUTPUT_FILE ,"TOP HEADLINES")
-    print(f"Saved {len(top)} headlines to {TOP_HEADLINES_OUTPUT_FILE}")
-else:
-    print("No Top headlines found. Try updating the XPath for your chosen site.")
-if latest:
-    save_to_file(latest[1:], LATEST_HEADLINES_OUTPUT_FILE,"LATEST HEADLINES")
-    print(f"Saved {len(latest)-1} headlines to {LATEST_HEADLINES_OUTPUT_FILE}")
-else:
-    print("No Latest headlines found. Try updating the XPath for your chosen site.")
-driver.quit()
-
-
-
-
-
+def fetch_page(url: str, timeout: float = 10) -> bytes:
+    """Download a page; lxml works out its encoding from the bytes"""
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = response.read()
+        if response.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+    return body
+
+
+def parse_headlines(page: bytes, xpath: str = HEADLINE_FUllXPATH) -> Optional[Tuple[List[str], List[str]]]:
+    """Top and latest headline lines from a page's HTML, or None if the headline block is not in it"""
+    headlines = load_lxml_html().fromstring(page).xpath(xpath)
+    if not headlines:
+        return None
+    sections = headlines[0].xpath("./div[1] | ./div[2]")
+    if len(sections) < 2:
+        return None
+    return element_lines(sections[0]), element_lines(sections[1])
+
+
+def scrape_with_browser(url: str, xpath: str = HEADLINE_FUllXPATH) -> Tuple[List[str], List[str]]:
+    """Top and latest headline lines as rendered by Chrome, for pages built by JavaScript"""
+    from selenium import webdriver
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    driver = webdriver.Chrome(service = Service(CHROMEDRIVER_PATH))
+    try:
+        driver.get(url)
+        # Wait only until the headlines are rendered, not a fixed time
+        try:
+            headlines = WebDriverWait(driver, WAIT_TIME * 5).until(
+                expected_conditions.presence_of_element_located((By.XPATH, xpath)))
+        except TimeoutException:
+            return [], []
+        top = headlines.find_element(By.XPATH, "./div[1]").text.split("\n")
+        latest = headlines.find_element(By.XPATH, "./div[2]").text.split("\n")
+        return top, latest
+    finally:
+        driver.quit()
+
+
+def get_headlines(url: str = NEWS_URL, html_file: str = None, browser: bool = False) -> Tuple[List[str], List[str]]:
+    if browser:
+        return scrape_with_browser(url)
+    if html_file is not None:
+        with open(html_file, "rb") as f:
+            return parse_headlines(f.read()) or ([], [])
+    found = parse_headlines(fetch_page(url))
+    if found is None:
+        print("Headlines are not in the page's HTML (it may build them with JavaScript); trying Chrome...")
+        return scrape_with_browser(url)
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Save the top and latest Indian Express headlines")
+    parser.add_argument("--html", metavar="FILE", help="parse a saved page instead of downloading it")
+    parser.add_argument("--browser", action="store_true", help="render the page in Chrome with Selenium")
+    parser.add_argument("--url", default=NEWS_URL)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        top, latest = get_headlines(args.url, args.html, args.browser)
+    except OSError as e:
+        print(f"Error reading {args.html or args.url}: {e}")
+        return
+    # Section names such as "TOP NEWS" are in capitals; headlines are not
+    temp = []
+    for i in range(0,len(top)):
+        if top[i].isupper():
+                continue
+        temp.append(top[i])
+
+    if temp:
+        save_to_file(temp, TOP_HEADLINES_OUTPUT_FILE ,"TOP HEADLINES")
+        print(f"Saved {len(temp)} headlines to {TOP_HEADLINES_OUTPUT_FILE}")
+    else:
+        print("No Top headlines found. Try updating the XPath for your chosen site.")
+    if latest:
+        save_to_file(latest[1:], LATEST_HEADLINES_OUTPUT_FILE,"LATEST HEADLINES")
+        print(f"Saved {len(latest)-1} headlines to {LATEST_HEADLINES_OUTPUT_FILE}")
+    else:
+        print("No Latest headlines found. Try updating the XPath for your chosen site.")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
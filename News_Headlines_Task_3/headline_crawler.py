@@ -0,0 +1,344 @@
+"""Fetch headlines from many news sites at once
+
+Each site is described by a Source: its URL and, for every section to collect
+(e.g. "top" and "latest"), the XPath of the element holding it and the rules
+for dropping lines that are not headlines, such as section titles in capitals.
+Sources are normally listed in a JSON file (see sources.json and
+load_sources()).
+
+crawl() downloads all sources concurrently with asyncio. Connections are kept
+alive and reused for later requests to the same host, at most per_host of them
+are open to any one host, and each request is bounded by a timeout. Pages are
+parsed with lxml in worker threads so parsing does not hold up downloads.
+Importing this module does nothing; run it as a script to crawl sources.json:
+
+    python headline_crawler.py --sources sources.json -o headlines
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import ssl
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+# Elements a browser renders on their own line, and elements it does not render
+BLOCK_TAGS = {"address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption",
+              "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li",
+              "main", "nav", "ol", "p", "section", "table", "tr", "ul"}
+HIDDEN_TAGS = {"script", "style", "noscript", "template"}
+
+
+def load_lxml_html():
+    try:
+        import lxml.html
+    except ImportError:
+        raise ImportError("lxml is required to parse pages without a browser (pip install lxml)") from None
+    return lxml.html
+
+
+def element_lines(element) -> List[str]:
+    """The element's text split into lines as a browser shows it (what Selenium's .text returns)"""
+    parts = []
+
+    def walk(node):
+        if not isinstance(node.tag, str) or node.tag in HIDDEN_TAGS:
+            return
+        block = node.tag in BLOCK_TAGS
+        if block:
+            parts.append("\n")
+        parts.append(node.text or "")
+        for child in node:
+            walk(child)
+            parts.append(child.tail or "")
+        if block:
+            parts.append("\n")
+
+    walk(element)
+    return [" ".join(line.split()) for line in "".join(parts).split("\n") if line.strip()]
+
+
+@dataclass
+class Section:
+    """Where one list of headlines is on a page and which of its lines to drop"""
+    xpath: str
+    skip_first: int = 0  # leading lines to drop, e.g. a "Latest News" title
+    skip_uppercase: bool = False  # drop lines in capitals, e.g. "TOP NEWS"
+    min_length: int = 1  # drop lines shorter than this, e.g. "More" links
+
+    def headlines(self, lines: List[str]) -> List[str]:
+        lines = lines[self.skip_first:]
+        return [line for line in lines
+                if len(line) >= self.min_length and not (self.skip_uppercase and line.isupper())]
+
+
+@dataclass
+class Source:
+    name: str
+    url: str
+    sections: Dict[str, Section]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Source":
+        sections = {name: Section(**section) for name, section in data["sections"].items()}
+        return cls(data["name"], data["url"], sections)
+
+    def extract(self, page: bytes) -> Optional[Dict[str, List[str]]]:
+        """The headlines of every section, or None if none of the sections is in the page"""
+        root = load_lxml_html().fromstring(page)
+        found = {}
+        for name, section in self.sections.items():
+            elements = root.xpath(section.xpath)
+            if elements:
+                found[name] = section.headlines(element_lines(elements[0]))
+        if not found:
+            return None
+        return {name: found.get(name, []) for name in self.sections}
+
+
+def load_sources(filename: str) -> List[Source]:
+    """Sources from a JSON file holding a list of Source.from_dict() dicts"""
+    with open(filename, "r", encoding="utf-8") as f:
+        return [Source.from_dict(data) for data in json.load(f)]
+
+
+class HttpError(OSError):
+    """A response that is not a page: an error status or too many redirects"""
+
+
+class Connection:
+    """One HTTP/1.1 connection that can carry several requests in turn"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.requests = 0
+
+    async def request(self, host: str, target: str, headers: Dict[str, str]) -> Tuple[int, dict, bytes, bool]:
+        """Send a GET and return the status, headers, body and whether the connection can be reused"""
+        lines = [f"GET {target} HTTP/1.1", f"Host: {host}"] + [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await self.writer.drain()
+        self.requests += 1
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        status = int(status)
+        keep_alive = version == "HTTP/1.1" and response_headers.get("connection", "").lower() != "close"
+        if status in (204, 304):
+            body = b""
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked()
+        elif "content-length" in response_headers:
+            body = await self.reader.readexactly(int(response_headers["content-length"]))
+        else:
+            body = await self.reader.read()
+            keep_alive = False
+        encoding = response_headers.get("content-encoding", "").lower()
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                # Some servers send raw deflate data without the zlib header
+                body = zlib.decompress(body, -zlib.MAX_WBITS)
+        return status, response_headers, body, keep_alive
+
+    async def _read_chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if not size:
+                break
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+        # Trailers, then the blank line that ends the body
+        while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    def close(self):
+        self.writer.close()
+
+
+class HttpClient:
+    """An asyncio HTTP/1.1 client that pools keep-alive connections per host.
+
+    At most per_host requests to one host run at a time, each on its own
+    connection; a finished connection waits in the pool for the next request
+    to that host instead of being closed.
+    """
+
+    def __init__(self, per_host: int = 4, timeout: float = 10, user_agent: str = USER_AGENT):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.headers = {"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        self.connections_opened = 0
+        self._limits: Dict[tuple, asyncio.Semaphore] = {}
+        self._idle: Dict[tuple, List[Connection]] = {}
+        self._ssl = ssl.create_default_context()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def get(self, url: str) -> bytes:
+        """The body of url after following redirects; raises OSError or asyncio.TimeoutError"""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, body = await self._get_once(url)
+            if status in REDIRECT_STATUSES and "location" in headers:
+                url = urljoin(url, headers["location"])
+                continue
+            if status >= 400:
+                raise HttpError(f"HTTP {status} from {url}")
+            return body
+        raise HttpError(f"Too many redirects from {url}")
+
+    async def _get_once(self, url: str) -> Tuple[int, dict, bytes]:
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        key = (parts.scheme, parts.hostname, parts.port or (443 if secure else 80))
+        host = parts.netloc.rpartition("@")[2]
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        limit = self._limits.setdefault(key, asyncio.Semaphore(self.per_host))
+        # The timeout starts once a connection slot for the host is free
+        async with limit:
+            return await asyncio.wait_for(self._exchange(key, secure, host, target), self.timeout)
+
+    async def _exchange(self, key: tuple, secure: bool, host: str, target: str) -> Tuple[int, dict, bytes]:
+        idle = self._idle.setdefault(key, [])
+        while True:
+            reused = bool(idle)
+            connection = idle.pop() if reused else await self._connect(key, secure)
+            try:
+                status, headers, body, keep_alive = await connection.request(host, target, self.headers)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                connection.close()
+                # The server may have closed an idle connection; retry on another one
+                if reused:
+                    continue
+                raise ConnectionResetError(f"Bad response from {host}") from None
+            except BaseException:
+                connection.close()
+                raise
+            if keep_alive:
+                idle.append(connection)
+            else:
+                connection.close()
+            return status, headers, body
+
+    async def _connect(self, key: tuple, secure: bool) -> Connection:
+        _, hostname, port = key
+        reader, writer = await asyncio.open_connection(hostname, port, ssl=self._ssl if secure else None)
+        self.connections_opened += 1
+        return Connection(reader, writer)
+
+    def close(self):
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+        self._idle.clear()
+
+
+@dataclass
+class CrawlResult:
+    source: Source
+    headlines: Dict[str, List[str]] = field(default_factory=dict)
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+async def crawl(sources: List[Source], per_host: int = 4, concurrency: int = 32,
+                timeout: float = 10) -> List[CrawlResult]:
+    """Fetch and parse every source concurrently; results are in the order of sources"""
+    load_lxml_html()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def crawl_one(client: HttpClient, source: Source) -> CrawlResult:
+        start = time.perf_counter()
+        result = CrawlResult(source)
+        try:
+            async with limit:
+                page = await client.get(source.url)
+            found = await asyncio.to_thread(source.extract, page)
+            if found is None:
+                result.error = "Headlines not found; update the XPaths or the page needs a browser"
+            else:
+                result.headlines = found
+        except asyncio.TimeoutError:
+            result.error = f"Timed out after {timeout}s"
+        except OSError as e:
+            result.error = str(e) or type(e).__name__
+        except Exception as e:
+            # Undecodable bodies, unparsable pages and bad XPaths only fail their own source
+            result.error = f"{type(e).__name__}: {e}"
+        result.seconds = time.perf_counter() - start
+        return result
+
+    async with HttpClient(per_host, timeout) as client:
+        return await asyncio.gather(*(crawl_one(client, source) for source in sources))
+
+
+def crawl_sources(sources: List[Source], **options) -> List[CrawlResult]:
+    """crawl() for code that is not already running an event loop"""
+    return asyncio.run(crawl(sources, **options))
+
+
+def save_results(results: List[CrawlResult], directory: str):
+    """Write each section of each source to <directory>/<source>_<section>headlines.txt"""
+    os.makedirs(directory, exist_ok=True)
+    for result in results:
+        for section, headlines in result.headlines.items():
+            filename = os.path.join(directory, f"{result.source.name}_{section}headlines.txt")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(f"\t\t\t\t{section.upper()} HEADLINES\n")
+                for idx, title in enumerate(headlines, 1):
+                    f.write(f"{idx}. {title}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch headlines from many news sites at once")
+    parser.add_argument("--sources", default=os.path.join(os.path.dirname(__file__), "sources.json"),
+                        help="JSON file listing the sources (default: sources.json)")
+    parser.add_argument("--per-host", type=int, default=4, help="connections per host (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight overall (default: 32)")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds per request (default: 10)")
+    parser.add_argument("-o", "--output", default=".", help="directory for the headline files")
+    args = parser.parse_args(argv)
+
+    sources = load_sources(args.sources)
+    start = time.perf_counter()
+    results = crawl_sources(sources, per_host=args.per_host, concurrency=args.concurrency, timeout=args.timeout)
+    save_results(results, args.output)
+    for result in results:
+        if result.error:
+            print(f"{result.source.name}: {result.error}")
+        else:
+            counts = ", ".join(f"{len(lines)} {name}" for name, lines in result.headlines.items())
+            print(f"{result.source.name}: {counts} ({result.seconds:.2f}s)")
+    print(f"Crawled {len(sources)} sources in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,173 +1,286 @@
 """
 Console-based To-Do List Application
 A complete, feature-rich CLI to-do manager that stores tasks in a JSON-formatted
-text file (tasks.txt). 
+text file (tasks.txt). Changes are appended to a journal (tasks.txt.journal)
+and folded back into tasks.txt once the journal grows large; the interactive
+menu writes them from a background thread. A filename ending in
+.db, .sqlite or .sqlite3 stores tasks in an indexed SQLite database instead.
 """
-import json
+import csv
 import datetime
+import json
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+from task_model import TIMESTAMP_FORMAT, Task
+from task_storage import FSYNC_NEVER, PRIORITY_ORDER, open_storage
+
+# Row fields add_tasks reads; each must be a string or missing
+IMPORTED_FIELDS = ("description", "priority", "category", "due_date", "notes")
 
 
 class TodoApp:
     """Core To-Do application logic"""
-    def __init__(self, filename: str = "tasks.txt"):
+    def __init__(self, filename: str = "tasks.txt", fsync: str = FSYNC_NEVER, compact_threshold: int = 1000,
+                 background: bool = False):
         self.filename = filename
-        self.tasks = []
-        self.load_tasks()
+        self.storage = open_storage(filename, fsync, compact_threshold, background)
+
+    @property
+    def tasks(self):
+        """All tasks in id order, as a list of dicts in the JSON layout"""
+        return [task.to_dict() for task in self.storage.query()]
 
     # ----------------- Persistence -----------------
     def load_tasks(self):
-        """Load tasks from disk"""
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, "r", encoding="utf-8") as file:
-                    content = file.read().strip()
-                    self.tasks = json.loads(content) if content else []
-            except (json.JSONDecodeError, OSError):
-                print("Warning: Corrupted tasks file. Starting fresh.")
-                self.tasks = []
-        else:
-            self.tasks = []
+        """Reload tasks from disk"""
+        self.storage.load()
 
     def save_tasks(self):
-        """Save tasks to disk"""
-        try:
-            with open(self.filename, "w", encoding="utf-8") as file:
-                json.dump(self.tasks, file, indent=2)
-        except OSError as e:
-            print(f"Error saving tasks: {e}")
+        """Make all changes durable (compacts the journal of a JSON task file)"""
+        self.storage.flush()
+
+    def close(self):
+        """Finish pending writes and release the task file"""
+        self.storage.close()
 
     # ----------------- CRUD -----------------
     def add_task(self, description: str, priority: str = "medium", category: str = "general", due_date: str = None):
         if not description.strip():
             print("Task description cannot be empty!")
             return False
-        task = {
-            "id": len(self.tasks) + 1,
-            "description": description.strip(),
-            "completed": False,
-            "priority": priority,
-            "category": category,
-            "created_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "due_date": due_date,
-            "completion_date": None,
-            "notes": ""
-        }
-        self.tasks.append(task)
-        self.save_tasks()
-        print(f" Task added! (ID: {task['id']})")
+        task = Task(
+            id=self.storage.allocate_id(),
+            description=description.strip(),
+            priority=priority,
+            category=category,
+            created_date=datetime.datetime.now().strftime(TIMESTAMP_FORMAT),
+            due_date=due_date,
+        )
+        self.storage.add(task)
+        print(f" Task added! (ID: {task.id})")
         return True
 
     def remove_task(self, task_id: int):
-        for i, task in enumerate(self.tasks):
-            if task["id"] == task_id:
-                self.tasks.pop(i)
-                self.save_tasks()
-                print(f"🗑️ Removed task {task_id}")
-                return True
+        if self.storage.remove(task_id):
+            print(f"🗑️ Removed task {task_id}")
+            return True
         print(" Task not found")
         return False
 
     def complete_task(self, task_id: int):
-        for task in self.tasks:
-            if task["id"] == task_id:
-                if task["completed"]:
-                    print("Task already completed")
-                    return False
-                task["completed"] = True
-                task["completion_date"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.save_tasks()
-                print("Task completed")
-                return True
-        print("Task not found")
-        return False
+        task = self.storage.get(task_id)
+        if task is None:
+            print("Task not found")
+            return False
+        if task.completed:
+            print("Task already completed")
+            return False
+        completion_date = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+        self.storage.update(task_id, {"completed": True, "completion_date": completion_date})
+        print("Task completed")
+        return True
 
     def uncomplete_task(self, task_id: int):
-        for task in self.tasks:
-            if task["id"] == task_id:
-                if not task["completed"]:
-                    print("Task already incomplete")
-                    return False
-                task["completed"] = False
-                task["completion_date"] = None
-                self.save_tasks()
-                print("Task marked incomplete")
-                return True
-        print(" Task not found")
-        return False
+        task = self.storage.get(task_id)
+        if task is None:
+            print(" Task not found")
+            return False
+        if not task.completed:
+            print("Task already incomplete")
+            return False
+        self.storage.update(task_id, {"completed": False, "completion_date": None})
+        print("Task marked incomplete")
+        return True
 
     def edit_task(self, task_id: int, field: str, new_value: str):
-        for task in self.tasks:
-            if task["id"] == task_id:
-                if field in {"description", "priority", "category", "due_date", "notes"}:
-                    task[field] = new_value
-                    self.save_tasks()
-                    print("Task updated")
-                    return True
-                print("Invalid field")
-                return False
-        print("Task not found")
-        return False
+        if self.storage.get(task_id) is None:
+            print("Task not found")
+            return False
+        if field not in {"description", "priority", "category", "due_date", "notes"}:
+            print("Invalid field")
+            return False
+        self.storage.update(task_id, {field: new_value})
+        print("Task updated")
+        return True
+
+    # ----------------- Bulk -----------------
+    @contextmanager
+    def batch(self):
+        """Apply many changes and persist them once: `with app.batch(): ...`
+
+        If the block raises, none of its changes are kept.
+        """
+        with self.storage.batch():
+            yield
+
+    def add_tasks(self, rows: Iterable[dict]) -> List[int]:
+        """Add tasks from dicts with description and optional priority, category, due_date and notes.
+
+        Rows that are not dicts of strings, or have an empty description, unknown
+        priority or malformed due date, are skipped.
+        """
+        created_date = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+        added, skipped = [], 0
+        with self.batch():
+            for row in rows:
+                if not isinstance(row, dict) or not all(
+                        isinstance(row.get(field), (str, type(None))) for field in IMPORTED_FIELDS):
+                    skipped += 1
+                    continue
+                description = (row.get("description") or "").strip()
+                priority = (row.get("priority") or "medium").strip().lower()
+                due_date = (row.get("due_date") or "").strip() or None
+                if not description or priority not in {"high", "medium", "low"}:
+                    skipped += 1
+                    continue
+                if due_date is not None:
+                    try:
+                        datetime.date.fromisoformat(due_date)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                task = Task(
+                    id=self.storage.allocate_id(),
+                    description=description,
+                    priority=priority,
+                    category=(row.get("category") or "general").strip(),
+                    created_date=created_date,
+                    due_date=due_date,
+                    notes=row.get("notes") or "",
+                )
+                self.storage.add(task)
+                added.append(task.id)
+        print(f" Added {len(added)} tasks" + (f" ({skipped} skipped)" if skipped else ""))
+        return added
+
+    def complete_tasks(self, task_ids: Iterable[int]) -> int:
+        completion_date = datetime.datetime.now().strftime(TIMESTAMP_FORMAT)
+        count = 0
+        with self.batch():
+            for task_id in task_ids:
+                task = self.storage.get(task_id)
+                if task is not None and not task.completed:
+                    self.storage.update(task_id, {"completed": True, "completion_date": completion_date})
+                    count += 1
+        print(f"Completed {count} tasks")
+        return count
+
+    def remove_tasks(self, task_ids: Iterable[int]) -> int:
+        with self.batch():
+            count = sum(self.storage.remove(task_id) for task_id in task_ids)
+        print(f"🗑️ Removed {count} tasks")
+        return count
+
+    def import_tasks(self, path: str) -> List[int]:
+        """Add every task in a CSV file (with a header row) or a JSON Lines file"""
+        return self.add_tasks(read_task_rows(path))
 
     # ----------------- Views -----------------
-    def view_tasks(self, filter_by: str = "all", sort_by: str = "id"):
-        if not self.tasks:
+    def view_tasks(self, filter_by: str = "all", sort_by: str = "id", page_size: int = None):
+        """Print matching tasks; with page_size, pause after each page until Enter (q stops)"""
+        # other programs may be editing the same task file
+        self.storage.refresh()
+        if not self.storage.count():
             print("No tasks found!")
             return
-        # filtering
-        filtered = []
-        for t in self.tasks:
-            if filter_by == "all":
-                filtered.append(t)
-            elif filter_by == "completed" and t["completed"]:
-                filtered.append(t)
-            elif filter_by == "incomplete" and not t["completed"]:
-                filtered.append(t)
-            elif filter_by == "overdue":
-                if t["due_date"] and not t["completed"] and datetime.datetime.strptime(t["due_date"], "%Y-%m-%d").date() < datetime.date.today():
-                    filtered.append(t)
-            elif filter_by.startswith("priority:"):
-                if t["priority"] == filter_by.split(":")[1]:
-                    filtered.append(t)
-            elif filter_by.startswith("category:"):
-                if t["category"] == filter_by.split(":")[1]:
-                    filtered.append(t)
-        # sorting
-        if sort_by == "priority":
-            order = {"high": 1, "medium": 2, "low": 3}
-            filtered.sort(key=lambda x: order.get(x["priority"], 4))
-        elif sort_by == "due_date":
-            filtered.sort(key=lambda x: x["due_date"] or "9999-12-31")
-        else:
-            filtered.sort(key=lambda x: x[sort_by])
-        # display
+        # filtering and sorting happen in the storage backend
+        filtered = self.storage.query(filter_by, sort_by)
+        # display, one write per page instead of several print calls per task
         print(f"Tasks ({filter_by}, sorted by {sort_by}):" + "="*80)
-
-        symbols = {"high": "🔴", "medium": "🟡", "low": "🟢"}
-        for t in filtered:
-            status = "✅" if t["completed"] else "⏳"
-            pri = symbols.get(t["priority"], "⚪")
-            print(f"{status} [{t['id']}] {pri} {t['description']}")
-            print(f"    Category: {t['category'].title()} | Priority: {t['priority'].title()}")
-            print(f"    Created: {t['created_date']}")
-            if t["due_date"]:
-                overdue = "  OVERDUE" if not t["completed"] and datetime.datetime.strptime(t["due_date"], "%Y-%m-%d").date() < datetime.date.today() else ""
-                print(f"    Due: {t['due_date']}{overdue}")
-            if t["completed"] and t["completion_date"]:
-                print(f"    Completed: {t['completion_date']}")
-            if t["notes"]:
-                print(f"    Notes: {t['notes']}")
-            print("-"*80)
+        today = datetime.date.today().isoformat()
+        page_size = page_size or len(filtered) or 1
+        for start in range(0, len(filtered), page_size):
+            sys.stdout.write("".join(format_task(t, today) for t in filtered[start:start + page_size]))
+            sys.stdout.flush()
+            remaining = len(filtered) - start - page_size
+            if remaining > 0 and input(f"-- {remaining} more: Enter to continue, q to stop -- ").strip().lower() == "q":
+                break
 
     def search_tasks(self, query: str):
         query = query.lower().strip()
-        matches = [t for t in self.tasks if query in t["description"].lower() or query in t["notes"].lower() or query in t["category"].lower()]
+        self.storage.refresh()
+        matches = self.storage.search(query)
         if not matches:
             print("No tasks found")
             return
         print(f" Search results for '{query}':")
         for t in matches:
-            print(f"[{t['id']}] {t['description']}")
+            print(f"[{t.id}] {t.description}")
+
+    def stats(self) -> dict:
+        """Task counts, overdue count, completion rate and average time to complete"""
+        self.storage.refresh()
+        return self.storage.stats()
+
+    def show_stats(self):
+        s = self.stats()
+        print(" Task Statistics" + "="*64)
+        print(f"Total: {s['total']} | Completed: {s['completed']} | Incomplete: {s['incomplete']}"
+              f" | Overdue: {s['overdue']}")
+        print(f"Completion rate: {s['completion_rate']:.1%}")
+        average = s["average_seconds_to_complete"]
+        print(f"Average time to complete: {format_duration(average) if average is not None else 'n/a'}")
+        by_priority = sorted(s["by_priority"].items(), key=lambda item: PRIORITY_ORDER.get(item[0], 4))
+        print("By priority: " + (", ".join(f"{TASK_SYMBOLS.get(p, '⚪')} {p.title()} {n}" for p, n in by_priority)
+                                 or "none"))
+        print("By category: " + (", ".join(f"{c.title()} {n}" for c, n in s["by_category"].items()) or "none"))
+
+TASK_SYMBOLS = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+
+
+def format_task(t: Task, today: str) -> str:
+    """The view_tasks entry for one task; today is an ISO date"""
+    status = "✅" if t.completed else "⏳"
+    pri = TASK_SYMBOLS.get(t.priority, "⚪")
+    lines = [f"{status} [{t.id}] {pri} {t.description}",
+             f"    Category: {t.category.title()} | Priority: {t.priority.title()}",
+             f"    Created: {t.created_date}"]
+    if t.due_date:
+        # ISO dates order the same as strings, so there is nothing to parse
+        overdue = "  OVERDUE" if not t.completed and t.due_date < today else ""
+        lines.append(f"    Due: {t.due_date}{overdue}")
+    if t.completed and t.completion_date:
+        lines.append(f"    Completed: {t.completion_date}")
+    if t.notes:
+        lines.append(f"    Notes: {t.notes}")
+    lines.append("-"*80)
+    return "\n".join(lines) + "\n"
+
+
+def format_duration(seconds: float) -> str:
+    """e.g. 2d 3h 15m; under a minute shows seconds"""
+    seconds = int(round(seconds))
+    if abs(seconds) < 60:
+        return f"{seconds}s"
+    minutes, _ = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    parts = [f"{days}d"] if days else []
+    if days or hours:
+        parts.append(f"{hours}h")
+    parts.append(f"{minutes}m")
+    return " ".join(parts)
+
+
+def read_task_rows(path: str) -> Iterator[Optional[dict]]:
+    """Stream rows from a .csv file with a header row or a .jsonl file of objects.
+
+    A JSONL line that is not valid JSON comes out as None, for add_tasks to skip.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if os.path.splitext(path)[1].lower() == ".csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield None
 
 # --------------- CLI Helpers ---------------
 
@@ -183,6 +296,8 @@ def display_menu():
     print("6.  Edit Task")
     print("7.  Search Tasks")
     print("8. Help")
+    print("9.  Import Tasks (CSV/JSONL)")
+    print("10. Statistics")
     print("0.  Exit")
 
 def display_help():
@@ -219,44 +334,62 @@ def get_task_id():
             print("Enter a valid number")
 
 # --------------- Main Loop ---------------
+PAGE_SIZE = 20
+
+
 def main():
-    app = TodoApp()
-    print(" Welcome! Tasks auto-save to 'tasks.txt'.")
-    while True:
-        display_menu()
-        choice = input("Choice: ").strip()
-        if choice == "0":
-            print("Goodbye!")
-            break
-        elif choice == "1":
-            desc = input("Description: ")
-            pr = get_valid_priority()
-            cat = input("Category [general]: ") or "general"
-            due = get_valid_date()
-            app.add_task(desc, pr, cat, due)
-        elif choice == "2":
-            app.view_tasks()
-        elif choice == "3":
-            app.view_tasks(filter_by="incomplete")
-            app.complete_task(get_task_id())
-        elif choice == "4":
-            app.view_tasks(filter_by="completed")
-            app.uncomplete_task(get_task_id())
-        elif choice == "5":
-            app.view_tasks()
-            app.remove_task(get_task_id())
-        elif choice == "6":
-            app.view_tasks()
-            tid = get_task_id()
-            field = input("Field to edit: ")
-            val = input("New value: ")
-            app.edit_task(tid, field, val)
-        elif choice == "7":
-            app.search_tasks(input("Search query: "))
-        elif choice == "8":
-            display_help()
-        else:
-            print("Invalid choice")
+    # Load tasks in the background so the menu appears at once, even for a large file
+    with ThreadPoolExecutor(max_workers=1) as loader:
+        # Saving also runs in the background, so the prompt never waits for the disk
+        loading = loader.submit(TodoApp, background=True)
+        print(" Welcome! Tasks auto-save to 'tasks.txt'.")
+        app = None
+        while True:
+            display_menu()
+            choice = input("Choice: ").strip()
+            if app is None:
+                app = loading.result()
+            if choice == "0":
+                app.close()
+                print("Goodbye!")
+                break
+            elif choice == "1":
+                desc = input("Description: ")
+                pr = get_valid_priority()
+                cat = input("Category [general]: ") or "general"
+                due = get_valid_date()
+                app.add_task(desc, pr, cat, due)
+            elif choice == "2":
+                app.view_tasks(page_size=PAGE_SIZE)
+            elif choice == "3":
+                app.view_tasks(filter_by="incomplete", page_size=PAGE_SIZE)
+                app.complete_task(get_task_id())
+            elif choice == "4":
+                app.view_tasks(filter_by="completed", page_size=PAGE_SIZE)
+                app.uncomplete_task(get_task_id())
+            elif choice == "5":
+                app.view_tasks(page_size=PAGE_SIZE)
+                app.remove_task(get_task_id())
+            elif choice == "6":
+                app.view_tasks(page_size=PAGE_SIZE)
+                tid = get_task_id()
+                field = input("Field to edit: ")
+                val = input("New value: ")
+                app.edit_task(tid, field, val)
+            elif choice == "7":
+                app.search_tasks(input("Search query: "))
+            elif choice == "8":
+                display_help()
+            elif choice == "9":
+                path = input("File to import (.csv or .jsonl): ").strip()
+                try:
+                    app.import_tasks(path)
+                except (OSError, ValueError) as e:
+                    print(f"Import failed: {e}")
+            elif choice == "10":
+                app.show_stats()
+            else:
+                print("Invalid choice")
 
 
 if __name__ == "__main__":
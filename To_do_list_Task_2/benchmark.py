@@ -0,0 +1,231 @@
+"""Benchmarks for TodoApp on synthetic task files
+
+generate_tasks() produces a reproducible task set with a realistic mix: most
+tasks are medium priority, a few categories hold most tasks, about 60% have a
+due date (some already past) and about 40% are completed some days after they
+were created. Each task file is generated once into a data directory and copied
+before every run, so runs start from identical files.
+
+Each operation is timed with time.perf_counter and then, unless --no-memory is
+given, repeated under tracemalloc to record its peak Python memory use.
+Operations that change tasks start both passes from a fresh copy of the file,
+so the memory pass sees the same tasks as the timed one. Results
+are written as JSON so runs before and after a change can be compared:
+
+    python benchmark.py --sizes 10000 100000 --formats .txt .bin .db -o before.json
+"""
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Iterator, List, Optional
+
+from task_model import TIMESTAMP_FORMAT, Task
+from task_storage import SQLITE_EXTENSIONS, open_storage
+from TO_DO_list_Task_2 import TodoApp
+
+SIZES = (10_000, 100_000, 1_000_000)
+FORMATS = (".txt", ".bin", ".db")
+FILTERS = ("all", "completed", "incomplete", "overdue", "due:7", "priority:high", "category:work")
+SORTS = ("id", "priority", "due_date")
+SEARCHES = ("report", "call mom", "fix", "invoice client")
+
+PRIORITIES = {"high": 0.2, "medium": 0.5, "low": 0.3}
+CATEGORIES = {"work": 0.35, "personal": 0.2, "home": 0.12, "shopping": 0.1, "health": 0.08,
+              "finance": 0.06, "study": 0.05, "errands": 0.04}
+VERBS = ("write", "review", "fix", "call", "email", "buy", "clean", "plan", "book", "pay", "update",
+         "prepare", "read", "schedule", "organize", "submit", "check", "renew", "send", "finish")
+OBJECTS = ("report", "mom", "dentist", "groceries", "invoice", "slides", "garage", "budget", "flight",
+           "rent", "resume", "bug", "client", "taxes", "newsletter", "car service", "notes", "backup",
+           "presentation", "insurance", "library books", "team meeting", "quarterly review", "gift")
+CONTEXTS = ("", "", "", " for the client", " before Friday", " with the team", " for next week", " again")
+
+
+def generate_tasks(count: int, seed: int = 0, today: Optional[datetime.date] = None) -> Iterator[dict]:
+    """Yield count synthetic tasks in the JSON task layout, the same ones for the same seed and day"""
+    rng = random.Random(seed)
+    now = datetime.datetime.combine(today or datetime.date.today(), datetime.time(12))
+    priorities, priority_weights = list(PRIORITIES), list(PRIORITIES.values())
+    categories, category_weights = list(CATEGORIES), list(CATEGORIES.values())
+    for task_id in range(1, count + 1):
+        created = now - datetime.timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        due_date = None
+        if rng.random() < 0.6:
+            due_date = (created + datetime.timedelta(days=rng.randint(-2, 45))).date().isoformat()
+        completion_date = None
+        if rng.random() < 0.4:
+            completed = min(created + datetime.timedelta(seconds=rng.expovariate(1 / (3 * 24 * 3600))), now)
+            completion_date = completed.strftime(TIMESTAMP_FORMAT)
+        yield {
+            "id": task_id,
+            "description": f"{rng.choice(VERBS).title()} {rng.choice(OBJECTS)}{rng.choice(CONTEXTS)}",
+            "completed": completion_date is not None,
+            "priority": rng.choices(priorities, priority_weights)[0],
+            "category": rng.choices(categories, category_weights)[0],
+            "created_date": created.strftime(TIMESTAMP_FORMAT),
+            "due_date": due_date,
+            "completion_date": completion_date,
+            "notes": "Generated task" if rng.random() < 0.2 else "",
+        }
+
+
+def write_task_file(path: str, count: int, seed: int = 0):
+    """Create a task file of any supported format holding generate_tasks(count, seed)"""
+    storage = open_storage(path)
+    try:
+        storage.add_many(Task.from_dict(task) for task in generate_tasks(count, seed))
+        storage.flush()
+    finally:
+        storage.close()
+
+
+def copy_task_file(source: str, destination: str):
+    """Copy a task file with its journal, index and other side files"""
+    directory, name = os.path.split(source)
+    for file in os.listdir(directory or "."):
+        if file.startswith(name):
+            shutil.copy2(os.path.join(directory, file), destination + file[len(name):])
+
+
+def remove_task_file(path: str):
+    """Delete a task file with its journal, index and other side files"""
+    directory, name = os.path.split(path)
+    for file in os.listdir(directory or "."):
+        if file.startswith(name):
+            os.remove(os.path.join(directory, file))
+
+
+class Runner:
+    """Times operations and collects one result record per operation"""
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.results: List[dict] = []
+
+    def run(self, operation: str, function: Callable[[], object], items: int,
+            setup: Optional[Callable[[], object]] = None, **labels):
+        """Time function, which handles items tasks or calls, and record throughput and peak memory.
+
+        setup, if given, runs untimed before each pass, e.g. to restore tasks the function changes.
+        """
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        result = {"operation": operation, **labels, "items": items, "seconds": round(seconds, 6),
+                  "items_per_second": round(items / seconds, 1) if seconds else None}
+        if self.trace_memory:
+            if setup is not None:
+                setup()
+            tracemalloc.start()
+            try:
+                function()
+                result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        self.results.append(result)
+        print(f"{operation:14} {json.dumps(labels):45} {seconds:10.4f}s", file=sys.stderr)
+
+
+def benchmark_file(runner: Runner, path: str, size: int, fmt: str, operations: int = 1000, seed: int = 0):
+    """Run every benchmarked TodoApp operation on a copy of the task file at path"""
+    labels = {"size": size, "format": fmt}
+    with tempfile.TemporaryDirectory() as work:
+        work_path = os.path.join(work, "tasks" + fmt)
+        copy_task_file(path, work_path)
+        # TodoApp prints every task it shows; the printing is part of what is measured
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            runner.run("load_tasks", lambda: TodoApp(work_path).close(), size, **labels)
+            app = TodoApp(work_path)
+            rng = random.Random(seed)
+
+            def reset():
+                """Reopen an unchanged copy of the task file, with the same random choices"""
+                nonlocal app, rng
+                app.close()
+                remove_task_file(work_path)
+                copy_task_file(path, work_path)
+                app = TodoApp(work_path)
+                rng = random.Random(seed)
+
+            try:
+                for filter_by in FILTERS:
+                    shown = len(app.storage.query(filter_by))
+                    for sort_by in SORTS:
+                        runner.run("view_tasks", lambda: app.view_tasks(filter_by, sort_by), shown,
+                                   filter=filter_by, sort=sort_by, **labels)
+                for query in SEARCHES:
+                    runner.run("search_tasks", lambda: app.search_tasks(query), 1, query=query, **labels)
+                runner.run("stats", app.stats, 1, **labels)
+                # Small files may hold fewer incomplete tasks than the operations asked for
+                completed = min(operations, len(app.storage.query("incomplete")))
+
+                def add():
+                    for i in range(operations):
+                        app.add_task(f"Benchmark task {i}", rng.choice(list(PRIORITIES)), "work")
+
+                def complete():
+                    for task in rng.sample(app.storage.query("incomplete"), completed):
+                        app.complete_task(task.id)
+
+                runner.run("add_task", add, operations, setup=reset, **labels)
+                runner.run("complete_task", complete, completed, setup=reset, **labels)
+                if fmt.lower().endswith(SQLITE_EXTENSIONS):
+                    # SQLite commits every change in place, so save_tasks has nothing to write
+                    return
+
+                def changed():
+                    reset()
+                    add()
+                    complete()
+
+                # Saves the tasks as adding and completing left them, in both passes
+                runner.run("save_tasks", lambda: app.save_tasks(), size + operations, setup=changed, **labels)
+            finally:
+                app.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark TodoApp on synthetic task files")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="task counts (default: 10k 100k 1M)")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, help="task file extensions, one backend each")
+    parser.add_argument("--data-dir", default="benchmark_data", help="where generated task files are kept")
+    parser.add_argument("--operations", type=int, default=1000, help="tasks added and completed per run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass (halves the run time)")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    runner = Runner(trace_memory=not args.no_memory)
+    for size in args.sizes:
+        for fmt in args.formats:
+            path = os.path.join(args.data_dir, f"tasks_{size}_{args.seed}_{datetime.date.today()}{fmt}")
+            if not os.path.exists(path):
+                print(f"Generating {path}", file=sys.stderr)
+                write_task_file(path, size, args.seed)
+            benchmark_file(runner, path, size, fmt, args.operations, args.seed)
+
+    report = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": runner.results,
+    }
+    with contextlib.ExitStack() as stack:
+        output = sys.stdout if args.output == "-" else stack.enter_context(open(args.output, "w", encoding="utf-8"))
+        json.dump(report, output, indent=2)
+        output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Columnar binary task snapshots
+
+A binary snapshot stores each task field as one column, so loading decodes a few
+large arrays and strings instead of parsing every task, and a reader that needs
+only some fields (e.g. id, completed and due_date for reminders) reads only
+those columns. Dates are stored as Task keeps them in memory (timestamps in
+seconds, due dates as ordinals), so they are never parsed or formatted.
+
+Layout, all integers little-endian:
+
+    header     MAGIC, version (u16), column count (u16), task count (u64)
+    directory  per column: field name (16 bytes, NUL padded), kind (u8),
+               byte offset (u64) and length (u64) of its data
+    data       the columns, one after another
+
+Column kinds, picked per column when writing:
+
+    INT    flag byte (1 if any value is None) + int64 array; None is -2**63
+    BOOL   one byte per task
+    DICT   code size (u8) + JSON length (u32) + JSON list of the distinct
+           values + one code per task indexing that list
+    TEXT   the values joined with NUL bytes, UTF-8 encoded
+    JSON   a JSON list, for columns no other kind can hold exactly
+"""
+import json
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from task_model import FIELDS, STORED_ATTRIBUTES, Task, decode_stored
+
+MAGIC = b"TASKCOLS"
+VERSION = 1
+
+INT, BOOL, DICT, TEXT, JSON = range(1, 6)
+
+_HEADER = struct.Struct("<8sHHQ")
+_ENTRY = struct.Struct("<16sBQQ")
+_DICT_HEADER = struct.Struct("<BI")
+_NULL = -2 ** 63
+_ENCODED_FIELDS = frozenset(("created_date", "due_date", "completion_date"))
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _encode(values: list):
+    """The kind and bytes of the most compact exact encoding of a column"""
+    types = set(map(type, values))
+    if types <= {int, type(None)}:
+        has_null = type(None) in types
+        try:
+            ints = array("q", [_NULL if value is None else value for value in values] if has_null else values)
+        except OverflowError:
+            return JSON, json.dumps(values).encode("utf-8")
+        return INT, bytes([has_null]) + _little_endian(ints)
+    if types <= {bool}:
+        return BOOL, bytes(values)
+    if types <= {str}:
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) <= 1 << 16 and len(distinct) * 4 < len(values):
+            codes = {value: code for code, value in enumerate(distinct)}
+            typecode = "B" if len(distinct) <= 1 << 8 else "H"
+            header = json.dumps(distinct).encode("utf-8")
+            return DICT, (_DICT_HEADER.pack(array(typecode).itemsize, len(header)) + header
+                          + _little_endian(array(typecode, [codes[value] for value in values])))
+        if not any("\0" in value for value in values):
+            return TEXT, "\0".join(values).encode("utf-8")
+    return JSON, json.dumps(values).encode("utf-8")
+
+
+def _decode(kind: int, data: bytes, count: int) -> list:
+    if kind == INT:
+        values = _from_little_endian("q", data[1:]).tolist()
+        if data[0]:
+            values = [None if value == _NULL else value for value in values]
+        return values
+    if kind == BOOL:
+        return [bool(value) for value in data]
+    if kind == DICT:
+        size, length = _DICT_HEADER.unpack_from(data)
+        start = _DICT_HEADER.size
+        distinct = json.loads(data[start:start + length])
+        codes = _from_little_endian("B" if size == 1 else "H", data[start + length:])
+        return [distinct[code] for code in codes]
+    if kind == TEXT:
+        return data.decode("utf-8").split("\0") if count else []
+    if kind == JSON:
+        return json.loads(data)
+    raise ValueError(f"Unknown column kind {kind}")
+
+
+def stored_columns(tasks: Iterable[Task]) -> List[list]:
+    """The stored value of every task for each of STORED_ATTRIBUTES"""
+    tasks = list(tasks)
+    return [[getattr(task, attribute) for task in tasks] for attribute in STORED_ATTRIBUTES]
+
+
+def encode_columns(columns: List[list]) -> bytes:
+    """A complete snapshot file holding the tasks in stored_columns() form"""
+    count = len(columns[0])
+    columns = [_encode(values) for values in columns]
+    offset = _HEADER.size + _ENTRY.size * len(FIELDS)
+    parts = [_HEADER.pack(MAGIC, VERSION, len(FIELDS), count)]
+    for field, (kind, data) in zip(FIELDS, columns):
+        parts.append(_ENTRY.pack(field.encode("ascii"), kind, offset, len(data)))
+        offset += len(data)
+    parts.extend(data for _, data in columns)
+    return b"".join(parts)
+
+
+def encode_tasks(tasks: Iterable[Task]) -> bytes:
+    return encode_columns(stored_columns(tasks))
+
+
+def read_columns(path: str, fields: Optional[Iterable[str]] = None, stored: bool = False) -> Dict[str, list]:
+    """Read only the given fields (all by default) of every task, as one list per field.
+
+    With stored=True, dates come back in their stored form (see STORED_ATTRIBUTES).
+    """
+    with open(path, "rb") as file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"{path} is not a task snapshot")
+        magic, version, column_count, count = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a task snapshot")
+        if version > VERSION:
+            raise ValueError(f"{path} was written by a newer version (format {version})")
+        directory = {}
+        for _ in range(column_count):
+            entry = file.read(_ENTRY.size)
+            if len(entry) < _ENTRY.size:
+                raise ValueError(f"{path} is truncated")
+            name, kind, offset, length = _ENTRY.unpack(entry)
+            directory[name.rstrip(b"\0").decode("ascii")] = kind, offset, length
+        columns = {}
+        for field in FIELDS if fields is None else fields:
+            if field not in directory:
+                raise KeyError(field)
+            kind, offset, length = directory[field]
+            file.seek(offset)
+            try:
+                values = _decode(kind, file.read(length), count)
+            except (IndexError, struct.error):
+                values = None
+            if values is None or len(values) != count:
+                raise ValueError(f"{path}: column {field} is damaged")
+            if not stored and field in _ENCODED_FIELDS:
+                values = [decode_stored(field, value) for value in values]
+            columns[field] = values
+    return columns
+
+
+def read_tasks(path: str) -> List[Task]:
+    columns = read_columns(path, stored=True)
+    return [Task.from_stored(*row) for row in zip(*(columns[field] for field in FIELDS))]
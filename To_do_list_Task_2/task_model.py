@@ -0,0 +1,166 @@
+"""Compact in-memory task records
+
+A Task uses __slots__ instead of a per-task dict. Priority and category strings
+are interned, so all tasks share one copy of each. Timestamps are stored as
+integer seconds since 1970-01-01 and due dates as date ordinals; both are parsed
+once, when set, and formatted back to the original strings on access. A value
+that would not format back to exactly the same string (e.g. a due date edited to
+free text) is kept as the string, so converting to a dict and back is lossless.
+"""
+import datetime
+import sys
+from typing import Optional, Union
+
+FIELDS = ("id", "description", "completed", "priority", "category",
+          "created_date", "due_date", "completion_date", "notes")
+
+# The Task attribute holding each of FIELDS, with dates in their stored (encoded) form
+STORED_ATTRIBUTES = ("id", "description", "completed", "priority", "category",
+                     "_created", "_due", "_completion", "notes")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _encode_timestamp(value: Optional[str]) -> Union[int, str, None]:
+    if not value:
+        return value
+    # fromisoformat/isoformat(" ") read and write TIMESTAMP_FORMAT far faster than strptime/strftime
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    if parsed.isoformat(" ") != value:
+        return value
+    return (parsed - _EPOCH) // datetime.timedelta(seconds=1)
+
+
+def _decode_timestamp(value: Union[int, str, None]) -> Optional[str]:
+    if isinstance(value, int):
+        return (_EPOCH + datetime.timedelta(seconds=value)).isoformat(" ")
+    return value
+
+
+def _encode_date(value: Optional[str]) -> Union[int, str, None]:
+    if not value:
+        return value
+    try:
+        parsed = datetime.date.fromisoformat(value)
+    except ValueError:
+        return value
+    if parsed.isoformat() != value:
+        return value
+    return parsed.toordinal()
+
+
+def _decode_date(value: Union[int, str, None]) -> Optional[str]:
+    if isinstance(value, int):
+        return datetime.date.fromordinal(value).isoformat()
+    return value
+
+
+def decode_stored(field: str, value):
+    """The value of field for a task whose STORED_ATTRIBUTES attribute is value"""
+    if field in ("created_date", "completion_date"):
+        return _decode_timestamp(value)
+    if field == "due_date":
+        return _decode_date(value)
+    return value
+
+
+class Task:
+    """One to-do item; attributes mirror the keys of the JSON task layout"""
+    __slots__ = ("id", "description", "completed", "priority", "category", "notes",
+                 "_created", "_due", "_completion")
+
+    def __init__(self, id: int, description: str, completed: bool = False, priority: str = "medium",
+                 category: str = "general", created_date: Optional[str] = None, due_date: Optional[str] = None,
+                 completion_date: Optional[str] = None, notes: str = ""):
+        self.id = id
+        self.description = description
+        self.completed = bool(completed)
+        self.priority = sys.intern(priority)
+        self.category = sys.intern(category)
+        self.notes = notes
+        self.created_date = created_date
+        self.due_date = due_date
+        self.completion_date = completion_date
+
+    @property
+    def created_date(self) -> Optional[str]:
+        return _decode_timestamp(self._created)
+
+    @created_date.setter
+    def created_date(self, value: Optional[str]):
+        self._created = _encode_timestamp(value)
+
+    @property
+    def completion_date(self) -> Optional[str]:
+        return _decode_timestamp(self._completion)
+
+    @completion_date.setter
+    def completion_date(self, value: Optional[str]):
+        self._completion = _encode_timestamp(value)
+
+    @property
+    def due_date(self) -> Optional[str]:
+        return _decode_date(self._due)
+
+    @due_date.setter
+    def due_date(self, value: Optional[str]):
+        self._due = _encode_date(value)
+
+    @property
+    def created_timestamp(self) -> Optional[int]:
+        """Seconds since 1970-01-01 (local time), or None if created_date is not a timestamp"""
+        return self._created if isinstance(self._created, int) else None
+
+    @property
+    def completion_timestamp(self) -> Optional[int]:
+        return self._completion if isinstance(self._completion, int) else None
+
+    @property
+    def due_ordinal(self) -> Optional[int]:
+        """Proleptic ordinal of the due date, or None if unset or not a YYYY-MM-DD date"""
+        return self._due if isinstance(self._due, int) else None
+
+    def __getitem__(self, field: str):
+        """Dict-style read access, as with the JSON layout"""
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def update(self, fields: dict):
+        for field, value in fields.items():
+            if field not in FIELDS[1:]:
+                raise KeyError(field)
+            if field in ("priority", "category"):
+                value = sys.intern(value)
+            elif field == "completed":
+                value = bool(value)
+            setattr(self, field, value)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        return cls(**{field: data[field] for field in FIELDS if field in data})
+
+    @classmethod
+    def from_stored(cls, id, description, completed, priority, category, created, due, completion, notes) -> "Task":
+        """A Task from values in STORED_ATTRIBUTES order, without parsing its dates again"""
+        task = cls.__new__(cls)
+        task.id = id
+        task.description = description
+        task.completed = completed
+        task.priority = priority
+        task.category = category
+        task._created = created
+        task._due = due
+        task._completion = completion
+        task.notes = notes
+        return task
+
+    def __repr__(self):
+        return f"Task({self.id}, {self.description!r})"
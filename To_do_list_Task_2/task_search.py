@@ -0,0 +1,124 @@
+"""Inverted full-text index behind TodoApp.search_tasks
+
+Each task's description, notes and category are split into lowercase word tokens.
+The index maps every token to the ids of the tasks that contain it, with term
+counts, and keeps a sorted vocabulary so the tokens starting with a prefix are
+found with a binary search. A query matches the tasks that contain, for every
+query word, some token starting with that word. Results are ranked by TF-IDF,
+and whole-word matches count double.
+
+A saved index is loaded without decoding its postings; each token's posting list
+is decoded the first time a query or an update touches it.
+"""
+import json
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from task_model import Task
+
+SEARCHED_FIELDS = frozenset(("description", "notes", "category"))
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def task_tokens(task: Task) -> Counter:
+    return Counter(tokenize(" ".join(getattr(task, field) or "" for field in SEARCHED_FIELDS)))
+
+
+class SearchIndex:
+    """Token postings for a set of tasks, updated as tasks change.
+
+    The index does not remember each task's tokens: remove() takes the task as
+    it was indexed and tokenizes it again.
+    """
+
+    def __init__(self):
+        # token -> {task id: count}, or a flat [id, count, id, count, ...] list until first used
+        self.postings: Dict[str, object] = {}
+        self.vocabulary: List[str] = []
+        self.size = 0
+
+    def _posting(self, token: str) -> Optional[Dict[int, int]]:
+        posting = self.postings.get(token)
+        if isinstance(posting, list):
+            posting = self.postings[token] = dict(zip(posting[::2], posting[1::2]))
+        return posting
+
+    def add(self, task: Task):
+        task_id = task.id
+        for token, count in task_tokens(task).items():
+            posting = self._posting(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                insort(self.vocabulary, token)
+            posting[task_id] = count
+        self.size += 1
+
+    def remove(self, task: Task):
+        task_id = task.id
+        for token in task_tokens(task):
+            posting = self._posting(token)
+            if posting is None or posting.pop(task_id, None) is None:
+                continue
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+        self.size -= 1
+
+    def _expand(self, prefix: str) -> Iterable[str]:
+        """Vocabulary tokens starting with prefix"""
+        i = bisect_left(self.vocabulary, prefix)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(prefix):
+            yield self.vocabulary[i]
+            i += 1
+
+    def search(self, query: str) -> List[int]:
+        """Ids of tasks matching every word of query, best match first"""
+        scores: Optional[Dict[int, float]] = None
+        for term in tokenize(query):
+            term_scores: Dict[int, float] = {}
+            for token in self._expand(term):
+                posting = self._posting(token)
+                weight = (2.0 if token == term else 1.0) * math.log(1 + self.size / len(posting))
+                for task_id, count in posting.items():
+                    if scores is None or task_id in scores:
+                        term_scores[task_id] = term_scores.get(task_id, 0.0) + count * weight
+            if scores is not None:
+                for task_id in term_scores:
+                    term_scores[task_id] += scores[task_id]
+            scores = term_scores
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores, key=lambda task_id: (-scores[task_id], task_id))
+
+    def to_json(self, stamp) -> dict:
+        postings = {}
+        for token, posting in self.postings.items():
+            postings[token] = posting if isinstance(posting, list) else [
+                value for item in posting.items() for value in item]
+        return {"stamp": stamp, "size": self.size, "postings": postings}
+
+    @classmethod
+    def load(cls, path: str, stamp) -> Optional["SearchIndex"]:
+        """The index saved at path, or None if it is missing or was saved for another snapshot"""
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get("stamp") != stamp:
+            return None
+        index = cls()
+        index.postings = data["postings"]
+        index.vocabulary = sorted(index.postings)
+        index.size = data["size"]
+        return index
@@ -0,0 +1,74 @@
+"""Task statistics kept current as tasks change
+
+TaskStats counts tasks by status, priority and category and sums the time from
+creation to completion of completed tasks. JsonStorage adds every task to it
+when the task is indexed and removes it when it is unindexed, so a report never
+scans the task list; SqliteStorage keeps the same counters in a table updated by
+triggers. How many tasks are overdue depends on today's date, so that count
+comes from each backend's due-date index instead.
+"""
+from collections import Counter
+from typing import Collection, Optional
+
+from task_model import Task
+
+
+def completion_seconds(task: Task) -> Optional[int]:
+    """Seconds from creation to completion, or None if the task is incomplete or a date is not a timestamp"""
+    if not task.completed:
+        return None
+    created, completed = task.created_timestamp, task.completion_timestamp
+    if created is None or completed is None:
+        return None
+    return completed - created
+
+
+class TaskStats:
+    """Counters over a set of tasks, updated one task at a time"""
+    __slots__ = ("total", "completed", "by_priority", "by_category", "timed", "seconds_to_complete")
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.by_priority = Counter()
+        self.by_category = Counter()
+        # Completed tasks with both timestamps, and their summed time to complete
+        self.timed = 0
+        self.seconds_to_complete = 0
+
+    def add(self, task: Task, sign: int = 1):
+        self.total += sign
+        self.completed += sign * task.completed
+        for counter, key in ((self.by_priority, task.priority), (self.by_category, task.category)):
+            counter[key] += sign
+            if not counter[key]:
+                del counter[key]
+        seconds = completion_seconds(task)
+        if seconds is not None:
+            self.timed += sign
+            self.seconds_to_complete += sign * seconds
+
+    def remove(self, task: Task):
+        self.add(task, -1)
+
+    def add_all(self, tasks: Collection[Task]):
+        """add() every task, counting whole columns at a time"""
+        self.total += len(tasks)
+        self.completed += sum(task.completed for task in tasks)
+        self.by_priority.update(task.priority for task in tasks)
+        self.by_category.update(task.category for task in tasks)
+        seconds = [value for value in map(completion_seconds, tasks) if value is not None]
+        self.timed += len(seconds)
+        self.seconds_to_complete += sum(seconds)
+
+    def report(self, overdue: int) -> dict:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "incomplete": self.total - self.completed,
+            "overdue": overdue,
+            "completion_rate": self.completed / self.total if self.total else 0.0,
+            "average_seconds_to_complete": self.seconds_to_complete / self.timed if self.timed else None,
+            "by_priority": dict(sorted(self.by_priority.items())),
+            "by_category": dict(sorted(self.by_category.items())),
+        }
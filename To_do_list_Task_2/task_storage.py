@@ -0,0 +1,1212 @@
+"""Storage backends for the To-Do application
+
+TodoApp talks to a TaskStorage, chosen from the file extension by open_storage:
+
+- JsonStorage keeps tasks in memory with a JSON snapshot file (tasks.txt).
+  Instead of rewriting the snapshot on every change, each mutation is appended
+  as one JSON line to a journal file next to it (tasks.txt.journal). Loading
+  replays the journal over the snapshot. Once the journal grows past a threshold
+  it is compacted: the snapshot is rewritten atomically and the journal is
+  truncated. Replaying is idempotent, so a crash between writing the snapshot
+  and truncating the journal loses nothing.
+
+  Several processes can share one task file. Each keeps its own copy in memory
+  and only holds a file lock (tasks.txt.lock) while reading or writing. The
+  snapshot's size and mtime plus the journal length act as a version stamp:
+  before writing, a process checks whether they moved on, and if so replays what
+  the others appended (or reloads after they compacted) and merges its own
+  unsaved changes field by field. Conflicting changes to the same field of a
+  task are dropped in favour of the saved version, with a message.
+- ColumnarStorage (.bin) is JsonStorage with a columnar binary snapshot
+  (task_columns) that loads and compacts several times faster than JSON.
+- SqliteStorage (.db, .sqlite, .sqlite3) keeps tasks in an indexed SQLite table
+  and answers filters and sorts with queries, so nothing is loaded up front.
+
+Run this module as a script to migrate tasks from one file to another.
+"""
+import atexit
+import datetime
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+from contextlib import ExitStack, contextmanager, nullcontext
+from copy import copy
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from task_columns import encode_columns, read_tasks, stored_columns
+from task_model import FIELDS, Task
+from task_search import SEARCHED_FIELDS, SearchIndex, tokenize
+from task_stats import TaskStats
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+FSYNC_ALWAYS = "always"      # fsync after every mutation: survives power loss
+FSYNC_INTERVAL = "interval"  # fsync at most once per second
+FSYNC_NEVER = "never"        # leave flushing to the OS, like the original save_tasks
+
+PRIORITY_ORDER = {"high": 1, "medium": 2, "low": 3}
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+COLUMNAR_EXTENSIONS = (".bin",)
+
+
+def replay(tasks: List[Task], entries: Iterable[dict]) -> Tuple[Dict[int, Task], int]:
+    """Apply journal entries to the snapshot's tasks.
+
+    Returns the tasks by id, in their original order, and the next unused id.
+    """
+    by_id = {task.id: task for task in tasks}
+    # Seeded from the snapshot so that removing its highest id never frees that id for reuse
+    next_id = max(by_id, default=0) + 1
+    for entry in entries:
+        op = entry.get("op")
+        if op == "add":
+            task = Task.from_dict(entry["task"])
+            by_id[task.id] = task
+            next_id = max(next_id, task.id + 1)
+        elif op == "update" and entry["id"] in by_id:
+            by_id[entry["id"]].update(entry["fields"])
+        elif op == "remove":
+            by_id.pop(entry["id"], None)
+        elif op == "meta":
+            next_id = max(next_id, entry["next_id"])
+    return by_id, max(next_id, max(by_id, default=0) + 1)
+
+
+def changed_fields(before: Task, after: Task) -> dict:
+    """The fields of after that differ from before, with their new values"""
+    return {field: getattr(after, field) for field in FIELDS[1:] if getattr(after, field) != getattr(before, field)}
+
+
+def write_atomic(filename: str, text: Union[str, bytes]):
+    """Replace filename with text without ever leaving a partial file (temp file + rename)"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_path = tempfile.mkstemp(prefix=".tasks-", dir=directory)
+    try:
+        # mkstemp creates the file as 0600; keep the mode of the file it replaces
+        os.chmod(temp_path, _file_mode(filename))
+        with (os.fdopen(fd, "wb") if isinstance(text, bytes) else os.fdopen(fd, "w", encoding="utf-8")) as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, filename)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _file_mode(filename: str) -> int:
+    """The permission bits of filename, or those a new file would get under the umask"""
+    try:
+        return os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def iter_snapshot(filename: str, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Stream the tasks of a JSON snapshot without reading the whole file into memory.
+
+    Reads chunk_size characters at a time and decodes one task object at a time
+    with raw_decode, so memory use is bounded by the largest task rather than
+    by the file. Raises ValueError on malformed content.
+    """
+    decoder = json.JSONDecoder()
+    with open(filename, "r", encoding="utf-8") as file:
+        buffer, pos, started = "", 0, False
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer) or (not eof and len(buffer) - pos < 2):
+                if eof:
+                    if started:
+                        raise ValueError("Unterminated task list")
+                    return  # An empty file holds no tasks
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Task file is not a JSON list")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                task, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The object continues in the next chunk
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield task
+
+
+def write_snapshot(filename: str, tasks: List[dict]):
+    """Atomically write tasks as a JSON list with one task per line.
+
+    json.dump(indent=2) always runs the pure-Python encoder; encoding each task
+    separately uses the C encoder and keeps the file readable.
+    """
+    lines = ",\n  ".join(map(json.dumps, tasks))
+    write_atomic(filename, f"[\n  {lines}\n]\n" if tasks else "[]\n")
+
+
+class TaskJournal:
+    """Append-only log of task mutations, one JSON object per line"""
+
+    def __init__(self, path: str, fsync: str = FSYNC_NEVER, compact_threshold: int = 1000):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self.entries = 0
+        self.size = 0  # bytes of the file read or written so far by this process
+        self._file = None
+        self._last_sync = 0.0
+
+    def read(self, start: int = 0) -> Iterator[dict]:
+        """Yield logged entries in order from byte offset start, cutting off a torn final line left by a crash"""
+        if not start:
+            self.entries = 0
+        self.size = start
+        if not os.path.exists(self.path):
+            return
+        valid_length = start
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                valid_length += len(line)
+                self.size = valid_length
+                self.entries += 1
+                yield entry
+            torn = file.seek(0, os.SEEK_END) != valid_length
+        if torn:
+            # Later appends must start on a fresh line
+            with open(self.path, "r+b") as file:
+                file.truncate(valid_length)
+
+    def append(self, entry: dict):
+        self.append_many([entry])
+
+    def append_many(self, entries: List[dict]):
+        """Append entries with a single write (and at most one fsync)"""
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        # Tasks in add entries are serialized here, so a batch compacted into a snapshot never converts them
+        self._file.write("".join(json.dumps(entry, separators=(",", ":"), default=Task.to_dict) + "\n"
+                                 for entry in entries))
+        self._file.flush()
+        self.size = os.fstat(self._file.fileno()).st_size
+        if self.fsync == FSYNC_ALWAYS or (
+                self.fsync == FSYNC_INTERVAL and time.monotonic() - self._last_sync >= 1.0):
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+        self.entries += len(entries)
+
+    def should_compact(self) -> bool:
+        return self.entries >= self.compact_threshold
+
+    def reset(self):
+        """Empty the journal once its entries are captured in a snapshot"""
+        self.close()
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self.entries = 0
+        self.size = 0
+
+    def disk_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def changed_on_disk(self) -> bool:
+        """Whether another process has written to the journal since this one last read or wrote it"""
+        return self.disk_size() != self.size
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FileLock:
+    """Advisory lock shared by every process that opens the same task file.
+
+    Uses fcntl.flock, or msvcrt.locking on Windows, where shared locks are
+    exclusive too. Within the process it is a re-entrant readers-writer lock:
+    threads may hold it shared together, an exclusive hold excludes every other
+    thread, and the file is locked once for all of them. A thread holding it
+    shared must not ask for it exclusively.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._owners: Dict[int, int] = {}  # thread id -> depth of its holds
+        self._exclusive = False
+        # Guards the fields above; never held while a holder runs
+        self._changed = threading.Condition()
+
+    @contextmanager
+    def hold(self, shared: bool = False):
+        me = threading.get_ident()
+        with self._changed:
+            if me in self._owners:
+                if not shared and not self._exclusive:
+                    raise RuntimeError("Cannot lock a task file exclusively while holding it shared")
+            else:
+                while self._owners and (self._exclusive or not shared):
+                    self._changed.wait()
+                if not self._owners:
+                    if self._file is None:
+                        self._file = open(self.path, "a+b")
+                    _lock_file(self._file, shared)
+                    self._exclusive = not shared
+            self._owners[me] = self._owners.get(me, 0) + 1
+        try:
+            yield
+        finally:
+            with self._changed:
+                self._owners[me] -= 1
+                if not self._owners[me]:
+                    del self._owners[me]
+                    if not self._owners:
+                        _unlock_file(self._file)
+                        self._exclusive = False
+                        self._changed.notify_all()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _lock_file(file, shared: bool):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return
+    file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # LK_LOCK gives up after 10 seconds; keep waiting
+
+
+def _unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class TaskStorage(ABC):
+    """Where TodoApp keeps its tasks; tasks go in and come out as Task records"""
+    _batch_depth = 0
+
+    @contextmanager
+    def batch(self):
+        """Group mutations so they are persisted together when the outermost batch ends.
+
+        If the block raises, none of the batch's mutations are kept.
+        """
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield
+            finally:
+                self._batch_depth -= 1
+            return
+        self._batch_depth = 1
+        self._begin_batch()
+        try:
+            yield
+        except BaseException:
+            self._batch_depth = 0
+            self._rollback_batch()
+            raise
+        self._batch_depth = 0
+        self._commit_batch()
+
+    def _begin_batch(self):
+        pass
+
+    def _commit_batch(self):
+        pass
+
+    def _rollback_batch(self):
+        pass
+
+    def load(self):
+        """(Re)read tasks from disk"""
+
+    def refresh(self):
+        """Pick up changes saved by other processes"""
+
+    def flush(self):
+        """Make every change so far durable"""
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def allocate_id(self) -> int:
+        """A new task id; ids are never reused, even after a task is removed"""
+
+    @abstractmethod
+    def get(self, task_id: int) -> Optional[Task]:
+        ...
+
+    @abstractmethod
+    def add(self, task: Task):
+        ...
+
+    def add_many(self, tasks: Iterable[Task]):
+        with self.batch():
+            for task in tasks:
+                self.add(task)
+
+    @abstractmethod
+    def update(self, task_id: int, fields: dict) -> bool:
+        ...
+
+    @abstractmethod
+    def remove(self, task_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    def query(self, filter_by: str = "all", sort_by: str = "id") -> List[Task]:
+        """Tasks matching a view_tasks filter, in view_tasks order"""
+
+    @abstractmethod
+    def search(self, query: str) -> List[Task]:
+        """Tasks with a word starting with each word of query, best match first"""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """TaskStats.report() of all tasks, from counters kept up to date by every change"""
+
+
+def due_window(filter_by: str) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """[start, end) due dates selected by the overdue and due:N filters, or None for other filters.
+
+    due:N selects tasks due between today and N days from today, inclusive.
+    """
+    today = datetime.date.today()
+    if filter_by == "overdue":
+        return datetime.date.min, today
+    if filter_by.startswith("due:"):
+        return today, today + datetime.timedelta(days=int(filter_by.split(":")[1]) + 1)
+    return None
+
+
+def sort_key(sort_by: str):
+    """view_tasks sort order; ties are broken by id"""
+    if sort_by == "priority":
+        return lambda task: (PRIORITY_ORDER.get(task.priority, 4), task.id)
+    if sort_by == "due_date":
+        return lambda task: (task.due_date or "9999-12-31", task.id)
+    if sort_by not in FIELDS:
+        raise KeyError(sort_by)
+    return lambda task: (getattr(task, sort_by), task.id)
+
+
+class JsonStorage(TaskStorage):
+    """Tasks held in memory, persisted as a JSON snapshot plus a journal.
+
+    Tasks are indexed by id and by priority, category and completion status, so
+    lookups take constant time and filtered views only touch matching tasks.
+    Each secondary index maps a value to a dict of id -> task, used as an
+    ordered set. Incomplete tasks with a due date are also kept in a list of
+    (due date ordinal, id) pairs sorted by due date, so overdue and due:N views
+    are answered with a binary search. A full-text SearchIndex is saved next to the snapshot
+    (tasks.txt.index) at every compaction and reused while it matches it.
+
+    With background=True, mutations only queue their journal entries and return.
+    A writer thread waits until no mutation has arrived for `debounce` seconds
+    (or at most 10 times that), then writes everything queued in one append, or
+    compacts, off the interactive thread. close() and flush() wait for it to catch up.
+
+    Changes saved by other processes are merged in whenever this one saves, and
+    by refresh(). Tasks another process added under an id this one also used are
+    renumbered. Whoever needs both locks takes the file lock before self._lock.
+    """
+
+    def __init__(self, filename: str, fsync: str = FSYNC_NEVER, compact_threshold: int = 1000,
+                 background: bool = False, debounce: float = 0.2):
+        self.filename = filename
+        self.journal = TaskJournal(filename + ".journal", fsync, compact_threshold)
+        self.index_path = filename + ".index"
+        self._pending: Optional[List[dict]] = None  # journal entries of an open batch
+        # Held while tasks change and while the writer thread copies them
+        self._lock = threading.Condition(threading.RLock())
+        # Held by a process while it reads or writes the files
+        self._file_lock = FileLock(filename + ".lock")
+        self._writer = None
+        self._writing = False
+        self.load()
+        if background:
+            self.debounce = debounce
+            self._queued: List[dict] = []
+            self._compact_requested = False
+            self._stopping = False
+            self._last_queued = 0.0
+            self._requests = self._completed = 0
+            self._writer = threading.Thread(target=self._write_in_background, name="task-writer", daemon=True)
+            self._writer.start()
+            # Unsaved changes are written even if the program exits without close()
+            atexit.register(self.close)
+
+    def _snapshot_stamp(self) -> Optional[list]:
+        """Identifies the snapshot file version, for the search index and other processes' changes"""
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load(self):
+        with self._file_lock.hold(shared=True), self._lock:
+            self._load()
+
+    def _load(self):
+        tasks = []
+        if os.path.exists(self.filename):
+            try:
+                tasks = self._read_tasks()
+            except (ValueError, KeyError, TypeError, OSError):
+                tasks = []
+                print("Warning: Corrupted tasks file. Starting fresh.")
+        entries = list(self.journal.read())
+        self._search = SearchIndex.load(self.index_path, self._snapshot_stamp())
+        if self._search is None:
+            self._by_id, self._next_id = replay(tasks, entries)
+            self._search = SearchIndex()
+            for task in self._by_id.values():
+                self._search.add(task)
+        else:
+            # The saved index matches the snapshot; re-index only the tasks the journal touched
+            touched = {entry["task"]["id"] if entry["op"] == "add" else entry["id"]
+                       for entry in entries if entry["op"] != "meta"}
+            indexed = [copy(task) for task in tasks if task.id in touched]
+            self._by_id, self._next_id = replay(tasks, entries)
+            for task in indexed:
+                self._search.remove(task)
+            for task_id in touched:
+                if task_id in self._by_id:
+                    self._search.add(self._by_id[task_id])
+        self._by_priority: Dict[str, Dict[int, Task]] = {}
+        self._by_category: Dict[str, Dict[int, Task]] = {}
+        self._by_completed: Dict[bool, Dict[int, Task]] = {True: {}, False: {}}
+        self._stats = TaskStats()
+        # The same indexes _index builds, filled in bulk
+        for task_id, task in self._by_id.items():
+            self._by_priority.setdefault(task.priority, {})[task_id] = task
+            self._by_category.setdefault(task.category, {})[task_id] = task
+            self._by_completed[task.completed][task_id] = task
+        self._incomplete_by_due: List[Tuple[int, int]] = sorted(
+            (task.due_ordinal, task_id) for task_id, task in self._by_completed[False].items()
+            if task.due_ordinal is not None)
+        self._stats.add_all(self._by_id.values())
+        # Unsaved changes: the saved version of each changed task (None if it is new)
+        self._base: Dict[int, Optional[Task]] = {}
+        self._stamp = self._snapshot_stamp()
+
+    def _index(self, task: Task):
+        task_id = task.id
+        self._by_priority.setdefault(task.priority, {})[task_id] = task
+        self._by_category.setdefault(task.category, {})[task_id] = task
+        self._by_completed[task.completed][task_id] = task
+        ordinal = task.due_ordinal
+        if ordinal is not None and not task.completed:
+            insort(self._incomplete_by_due, (ordinal, task_id))
+        self._stats.add(task)
+
+    def _unindex(self, task: Task):
+        task_id = task.id
+        for index, key in ((self._by_priority, task.priority), (self._by_category, task.category)):
+            bucket = index[key]
+            del bucket[task_id]
+            if not bucket:
+                del index[key]
+        del self._by_completed[task.completed][task_id]
+        ordinal = task.due_ordinal
+        if ordinal is not None and not task.completed:
+            del self._incomplete_by_due[bisect_left(self._incomplete_by_due, (ordinal, task_id))]
+        self._stats.remove(task)
+
+    def _read_tasks(self) -> List[Task]:
+        return [Task.from_dict(task) for task in iter_snapshot(self.filename)]
+
+    def _copy_tasks(self):
+        """The current tasks, as _write_tasks takes them; call with the lock held"""
+        return [task.to_dict() for task in self._by_id.values()]
+
+    def _write_tasks(self, tasks):
+        write_snapshot(self.filename, tasks)
+
+    def _copy_for_snapshot(self) -> tuple:
+        """The current tasks, id counter and search postings; call with the lock held"""
+        return self._copy_tasks(), self._next_id, self._search.to_json(None)
+
+    def _write_snapshot(self, tasks, next_id: int, index: dict):
+        self._write_tasks(tasks)
+        self.journal.reset()
+        # The snapshot cannot hold the id counter, so it opens the new journal
+        self.journal.append({"op": "meta", "next_id": next_id})
+        self._stamp = index["stamp"] = self._snapshot_stamp()
+        write_atomic(self.index_path, json.dumps(index))
+
+    def _changed_on_disk(self) -> bool:
+        """Whether another process has saved tasks since this one last read or wrote the files"""
+        return self._snapshot_stamp() != self._stamp or self.journal.changed_on_disk()
+
+    def _save(self, entries: List[dict], base: Dict[int, Optional[Task]], compact: bool = False):
+        """Write entries, or a snapshot, on top of whatever other processes have saved meanwhile.
+
+        base holds the tasks entries change, as they were when this process last
+        synced with the files; it is used to merge in other processes' changes.
+        """
+        try:
+            with self._file_lock.hold():
+                if self._changed_on_disk():
+                    with self._lock:
+                        entries = self._merge(base)
+                if compact:
+                    with self._lock:
+                        snapshot = self._copy_for_snapshot()
+                    self._write_snapshot(*snapshot)
+                elif entries:
+                    self.journal.append_many(entries)
+        except OSError as e:
+            print(f"Error saving tasks: {e}")
+
+    def _merge(self, base: Dict[int, Optional[Task]]) -> List[dict]:
+        """Take in the changes other processes saved and rebase this process's unsaved changes on them.
+
+        Returns the journal entries that save this process's changes. A change
+        to a field another process also changed (or to a task it removed) is a
+        conflict: the saved version wins and the change is dropped. Call with the
+        file lock and self._lock held.
+        """
+        # Unsaved changes not handed to this save yet are folded into it
+        for task_id, before in self._base.items():
+            base.setdefault(task_id, before)
+        self._base = {}
+        if self._writer is not None:
+            self._queued = []
+        mine = {task_id: self._by_id.get(task_id) for task_id in base}
+        next_id = self._next_id
+        if self._snapshot_stamp() != self._stamp or self.journal.disk_size() < self.journal.size:
+            # Another process compacted the journal into a new snapshot
+            self.load()
+        else:
+            # Rewind the changed tasks to their saved versions and replay what was appended since
+            for task_id, before in base.items():
+                self._drop(task_id)
+                if before is not None:
+                    self._insert(copy(before))
+            for entry in list(self.journal.read(self.journal.size)):
+                self._apply(entry)
+        self._next_id = max(self._next_id, next_id)
+        entries = []
+        for task_id, before in base.items():
+            saved, ours = self._by_id.get(task_id), mine[task_id]
+            if before is None:
+                if ours is None:
+                    continue
+                if saved is not None:
+                    ours.id = self.allocate_id()
+                    print(f"Task {task_id} was saved as task {ours.id}: another process used ID {task_id}")
+                self._insert(ours)
+                entries.append({"op": "add", "task": ours})
+            elif ours is None:
+                if saved is None:
+                    continue
+                if changed_fields(before, saved):
+                    print(f"Conflict: task {task_id} was changed by another process, so it was not removed")
+                    continue
+                self._drop(task_id)
+                entries.append({"op": "remove", "id": task_id})
+            elif saved is None:
+                if changed_fields(before, ours):
+                    print(f"Conflict: task {task_id} was removed by another process; your changes were discarded")
+            else:
+                ours_changed, saved_changed = changed_fields(before, ours), changed_fields(before, saved)
+                fields = {field: value for field, value in ours_changed.items()
+                          if saved_changed.get(field, value) == value}
+                if len(fields) < len(ours_changed):
+                    lost = ", ".join(sorted(set(ours_changed) - set(fields)))
+                    print(f"Conflict: task {task_id} was changed by another process; kept its {lost}")
+                fields = {field: value for field, value in fields.items() if getattr(saved, field) != value}
+                if fields:
+                    self._change(saved, fields)
+                    entries.append({"op": "update", "id": task_id, "fields": fields})
+        return entries
+
+    def refresh(self):
+        """Pick up changes other processes have saved, unless this one has unsaved changes of its own"""
+        with self._file_lock.hold(shared=True):
+            if not self._changed_on_disk():
+                return
+            with self._lock:
+                if self._base or self._pending is not None or self._writing:
+                    return
+                self._merge({})
+
+    def flush(self):
+        """Write a full snapshot and empty the journal (compaction)"""
+        if self._writer is not None:
+            self._wait_for_writer(compact=True)
+            return
+        with self._file_lock.hold(), self._lock:
+            base, self._base = self._base, {}
+            self._save([], base, compact=True)
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            with self._lock:
+                self._stopping = True
+                self._lock.notify_all()
+            self._writer.join()
+            atexit.unregister(self.close)
+        self.journal.close()
+        self._file_lock.close()
+
+    def _wait_for_writer(self, compact: bool = False):
+        """Have the writer thread save everything queued so far, without the debounce delay"""
+        with self._lock:
+            self._requests += 1
+            request = self._requests
+            self._compact_requested |= compact
+            self._lock.notify_all()
+            while self._completed < request and self._writer.is_alive():
+                self._lock.wait()
+
+    def _write_in_background(self):
+        while True:
+            with self._lock:
+                while not (self._queued or self._compact_requested or self._stopping
+                           or self._requests > self._completed):
+                    self._lock.wait()
+                deadline = self._last_queued + self.debounce
+                give_up = time.monotonic() + 10 * self.debounce
+                while not (self._stopping or self._requests > self._completed) and time.monotonic() < min(
+                        deadline, give_up):
+                    self._lock.wait(min(deadline, give_up) - time.monotonic())
+                    deadline = self._last_queued + self.debounce
+                entries, self._queued = self._queued, []
+                base, self._base = self._base, {}
+                request = self._requests
+                compact = self._compact_requested or (
+                        self.journal.entries + len(entries) >= self.journal.compact_threshold)
+                self._compact_requested = False
+                stopping = self._stopping
+                self._writing = True
+            # File I/O happens without self._lock, so mutations are only blocked while merging
+            self._save(entries, base, compact)
+            with self._lock:
+                self._writing = False
+                self._completed = request
+                self._lock.notify_all()
+                if stopping and not self._queued:
+                    return
+
+    def _persist(self, entries: List[dict]):
+        """Save journal entries now, or hand them to the writer thread"""
+        if self._writer is not None:
+            with self._lock:
+                self._queued.extend(entries)
+                self._last_queued = time.monotonic()
+                self._lock.notify_all()
+            return
+        base, self._base = self._base, {}
+        # Cheaper to write one snapshot than to journal a large batch
+        self._save(entries, base, self.journal.entries + len(entries) >= self.journal.compact_threshold)
+
+    @contextmanager
+    def _mutating(self):
+        """The locks for one mutation; saving it without the writer thread also needs the file lock"""
+        with self._file_lock.hold() if self._writer is None else nullcontext(), self._lock:
+            yield
+
+    def _begin_batch(self):
+        # The writer thread must not save half a batch, and views inside the
+        # batch refresh under the file lock, so both are held until it ends
+        self._batch_locks = ExitStack()
+        self._batch_locks.enter_context(self._file_lock.hold())
+        self._batch_locks.enter_context(self._lock)
+        self._pending = []
+        self._batch_base: Dict[int, Optional[Task]] = {}
+        self._base_before_batch = set(self._base)
+
+    def _commit_batch(self):
+        try:
+            pending, self._pending = self._pending, None
+            self._persist(pending)
+        finally:
+            self._batch_locks.close()
+
+    def _rollback_batch(self):
+        # Nothing from the batch reached the disk; put back the tasks it changed
+        try:
+            self._pending = None
+            for task_id, before in self._batch_base.items():
+                self._drop(task_id)
+                if before is not None:
+                    self._insert(before)
+                if task_id not in self._base_before_batch:
+                    del self._base[task_id]
+        finally:
+            self._batch_locks.close()
+
+    def _log(self, entry: dict):
+        """Persist one mutation by appending it to the journal"""
+        if self._pending is not None:
+            self._pending.append(entry)
+        else:
+            self._persist([entry])
+
+    def _remember(self, task_id: int):
+        """Keep the saved version of a task before its first unsaved change, for _merge and rollbacks"""
+        if task_id in self._base and (self._pending is None or task_id in self._batch_base):
+            return
+        task = self._by_id.get(task_id)
+        before = copy(task) if task is not None else None
+        self._base.setdefault(task_id, before)
+        if self._pending is not None:
+            self._batch_base.setdefault(task_id, before)
+
+    def count(self) -> int:
+        return len(self._by_id)
+
+    def allocate_id(self) -> int:
+        with self._lock:
+            task_id = self._next_id
+            self._next_id += 1
+        return task_id
+
+    def get(self, task_id: int) -> Optional[Task]:
+        return self._by_id.get(task_id)
+
+    def _insert(self, task: Task):
+        self._drop(task.id)
+        self._by_id[task.id] = task
+        self._index(task)
+        self._search.add(task)
+        self._next_id = max(self._next_id, task.id + 1)
+
+    def _change(self, task: Task, fields: dict):
+        reindex_text = not SEARCHED_FIELDS.isdisjoint(fields)
+        self._unindex(task)
+        if reindex_text:
+            self._search.remove(task)
+        task.update(fields)
+        self._index(task)
+        if reindex_text:
+            self._search.add(task)
+
+    def _drop(self, task_id: int) -> Optional[Task]:
+        task = self._by_id.pop(task_id, None)
+        if task is not None:
+            self._unindex(task)
+            self._search.remove(task)
+        return task
+
+    def _apply(self, entry: dict):
+        """Apply a journal entry written by another process"""
+        op = entry.get("op")
+        if op == "add":
+            self._insert(Task.from_dict(entry["task"]))
+        elif op == "update" and entry["id"] in self._by_id:
+            self._change(self._by_id[entry["id"]], entry["fields"])
+        elif op == "remove":
+            self._drop(entry["id"])
+        elif op == "meta":
+            self._next_id = max(self._next_id, entry["next_id"])
+
+    def add(self, task: Task):
+        with self._mutating():
+            self._remember(task.id)
+            self._insert(task)
+            self._log({"op": "add", "task": task})
+
+    def update(self, task_id: int, fields: dict) -> bool:
+        with self._mutating():
+            task = self._by_id.get(task_id)
+            if task is None:
+                return False
+            self._remember(task_id)
+            self._change(task, fields)
+            self._log({"op": "update", "id": task_id, "fields": fields})
+        return True
+
+    def remove(self, task_id: int) -> bool:
+        with self._mutating():
+            if task_id not in self._by_id:
+                return False
+            self._remember(task_id)
+            self._drop(task_id)
+            self._log({"op": "remove", "id": task_id})
+        return True
+
+    def _candidates(self, filter_by: str) -> Iterable[Task]:
+        """The smallest indexed set of tasks that contains every match of filter_by"""
+        if filter_by == "all":
+            return self._by_id.values()
+        if filter_by == "completed":
+            return self._by_completed[True].values()
+        if filter_by == "incomplete":
+            return self._by_completed[False].values()
+        window = due_window(filter_by)
+        if window is not None:
+            due = self._incomplete_by_due
+            start = bisect_left(due, (window[0].toordinal(),))
+            end = bisect_left(due, (window[1].toordinal(),))
+            return [self._by_id[task_id] for _, task_id in due[start:end]]
+        if filter_by.startswith("priority:"):
+            return self._by_priority.get(filter_by.split(":")[1], {}).values()
+        if filter_by.startswith("category:"):
+            return self._by_category.get(filter_by.split(":")[1], {}).values()
+        return ()
+
+    def query(self, filter_by: str = "all", sort_by: str = "id") -> List[Task]:
+        return sorted(self._candidates(filter_by), key=sort_key(sort_by))
+
+    def search(self, query: str) -> List[Task]:
+        if not tokenize(query):
+            return self.query()
+        return [self._by_id[task_id] for task_id in self._search.search(query)]
+
+    def stats(self) -> dict:
+        overdue = bisect_left(self._incomplete_by_due, (datetime.date.today().toordinal(),))
+        return self._stats.report(overdue)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    description TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    priority TEXT NOT NULL,
+    category TEXT NOT NULL,
+    created_date TEXT NOT NULL,
+    due_date TEXT,
+    completion_date TEXT,
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS tasks_completed_due ON tasks (completed, due_date);
+CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority);
+CREATE INDEX IF NOT EXISTS tasks_category ON tasks (category);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('next_id', (SELECT COALESCE(MAX(id), 0) + 1 FROM tasks));
+"""
+
+# External-content FTS5 index over the searched columns, kept in sync by triggers
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE tasks_fts USING fts5(description, notes, category, content='tasks', content_rowid='id');
+CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+    INSERT INTO tasks_fts (rowid, description, notes, category)
+    VALUES (new.id, new.description, new.notes, new.category);
+END;
+CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, description, notes, category)
+    VALUES ('delete', old.id, old.description, old.notes, old.category);
+END;
+CREATE TRIGGER tasks_fts_update AFTER UPDATE OF description, notes, category ON tasks BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, description, notes, category)
+    VALUES ('delete', old.id, old.description, old.notes, old.category);
+    INSERT INTO tasks_fts (rowid, description, notes, category)
+    VALUES (new.id, new.description, new.notes, new.category);
+END;
+INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild');
+"""
+
+
+def _timed(row: str) -> str:
+    """SQL condition matching task_stats.completion_seconds() not being None"""
+    return " AND ".join([f"{row}.completed"] + [
+        f"strftime('%Y-%m-%d %H:%M:%S', {row}.{column}) IS {row}.{column}"
+        for column in ("created_date", "completion_date")])
+
+
+def _count(row: str, sign: str) -> str:
+    """Trigger statements adding (sign +) or removing (sign -) one task's contribution to task_counts"""
+    seconds = f"strftime('%s', {row}.completion_date) - strftime('%s', {row}.created_date)"
+    return f"""
+    INSERT INTO task_counts VALUES ('priority', {row}.priority, {sign}1), ('category', {row}.category, {sign}1),
+        ('completed', {row}.completed, {sign}1) ON CONFLICT DO UPDATE SET value = value + excluded.value;
+    INSERT INTO task_counts SELECT 'completion', 'count', {sign}1 WHERE {_timed(row)}
+        ON CONFLICT DO UPDATE SET value = value + excluded.value;
+    INSERT INTO task_counts SELECT 'completion', 'seconds', {sign}({seconds}) WHERE {_timed(row)}
+        ON CONFLICT DO UPDATE SET value = value + excluded.value;"""
+
+
+# TaskStats counters as rows of (kind, key, value), kept current by triggers
+_COUNTS_SCHEMA = f"""
+CREATE TABLE task_counts (kind TEXT NOT NULL, key TEXT NOT NULL, value INTEGER NOT NULL, PRIMARY KEY (kind, key));
+CREATE TRIGGER task_counts_insert AFTER INSERT ON tasks BEGIN {_count("new", "+")}
+END;
+CREATE TRIGGER task_counts_delete AFTER DELETE ON tasks BEGIN {_count("old", "-")}
+END;
+CREATE TRIGGER task_counts_update AFTER UPDATE OF completed, priority, category, created_date, completion_date
+ON tasks BEGIN {_count("old", "-")} {_count("new", "+")}
+END;
+INSERT INTO task_counts SELECT 'priority', priority, COUNT(*) FROM tasks GROUP BY priority;
+INSERT INTO task_counts SELECT 'category', category, COUNT(*) FROM tasks GROUP BY category;
+INSERT INTO task_counts SELECT 'completed', completed, COUNT(*) FROM tasks GROUP BY completed;
+INSERT INTO task_counts SELECT 'completion', 'count', COUNT(*) FROM tasks WHERE {_timed("tasks")};
+INSERT INTO task_counts SELECT 'completion', 'seconds',
+    COALESCE(SUM(strftime('%s', completion_date) - strftime('%s', created_date)), 0) FROM tasks WHERE {_timed("tasks")};
+"""
+
+_SQL_ORDER = {
+    "priority": "CASE priority WHEN 'high' THEN 1 WHEN 'medium' THEN 2 WHEN 'low' THEN 3 ELSE 4 END, id",
+    "due_date": "COALESCE(due_date, '9999-12-31'), id",
+}
+
+
+class ColumnarStorage(JsonStorage):
+    """JsonStorage whose snapshot is a columnar binary file (see task_columns) instead of JSON.
+
+    Loading and compacting skip JSON parsing and date conversions, and
+    task_columns.read_columns() can read a few fields of every task without
+    loading the rest.
+    """
+
+    def _read_tasks(self) -> List[Task]:
+        return read_tasks(self.filename)
+
+    def _copy_tasks(self) -> List[list]:
+        return stored_columns(self._by_id.values())
+
+    def _write_tasks(self, columns: List[list]):
+        write_atomic(self.filename, encode_columns(columns))
+
+
+class SqliteStorage(TaskStorage):
+    """Tasks in an SQLite table, with view_tasks filters and sorts answered from indexes"""
+
+    def __init__(self, filename: str, fsync: str = FSYNC_NEVER):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute(f"PRAGMA synchronous = {'FULL' if fsync == FSYNC_ALWAYS else 'NORMAL'}")
+        self.connection.executescript(_SCHEMA)
+        if not self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'task_counts'").fetchone():
+            # Counted once from the existing tasks, then maintained by the triggers
+            self.connection.executescript(f"BEGIN; {_COUNTS_SCHEMA} COMMIT;")
+        self.full_text = self._create_full_text_index()
+
+    def _create_full_text_index(self) -> bool:
+        """Add the FTS5 search index if missing; False when SQLite was built without FTS5"""
+        if self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone():
+            return True
+        try:
+            self.connection.executescript(f"BEGIN; {_FTS_SCHEMA} COMMIT;")
+        except sqlite3.OperationalError:
+            self.connection.rollback()
+            return False
+        return True
+
+    @staticmethod
+    def _task(row: tuple) -> Task:
+        # SELECT * returns the columns in FIELDS order, which is Task's argument order
+        return Task(*row)
+
+    def flush(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self):
+        """Commit when the block ends, unless it is part of a batch"""
+        if self._batch_depth:
+            yield
+        else:
+            with self.connection:
+                yield
+
+    def _commit_batch(self):
+        self.connection.commit()
+
+    def _rollback_batch(self):
+        self.connection.rollback()
+
+    def allocate_id(self) -> int:
+        with self._transaction():
+            task_id = self.connection.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()[0]
+            self.connection.execute("UPDATE meta SET value = ? WHERE key = 'next_id'", (task_id + 1,))
+        return task_id
+
+    def get(self, task_id: int) -> Optional[Task]:
+        row = self.connection.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._task(row) if row else None
+
+    def add(self, task: Task):
+        self.add_many([task])
+
+    def add_many(self, tasks: Iterable[Task]):
+        with self._transaction():
+            self.connection.executemany(
+                # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the FTS trigger
+                f"INSERT INTO tasks ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})"
+                f" ON CONFLICT (id) DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in FIELDS[1:])}",
+                ([getattr(task, field) for field in FIELDS] for task in tasks))
+            self.connection.execute(
+                "UPDATE meta SET value = MAX(value, (SELECT COALESCE(MAX(id), 0) + 1 FROM tasks))"
+                " WHERE key = 'next_id'")
+
+    def update(self, task_id: int, fields: dict) -> bool:
+        unknown = set(fields) - set(FIELDS[1:])
+        if unknown:
+            raise KeyError(f"Unknown task fields: {', '.join(sorted(unknown))}")
+        with self._transaction():
+            cursor = self.connection.execute(
+                f"UPDATE tasks SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+                (*fields.values(), task_id))
+        return cursor.rowcount > 0
+
+    def remove(self, task_id: int) -> bool:
+        with self._transaction():
+            cursor = self.connection.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def query(self, filter_by: str = "all", sort_by: str = "id") -> List[Task]:
+        if filter_by == "all":
+            where, params = "1", ()
+        elif filter_by == "completed":
+            where, params = "completed = 1", ()
+        elif filter_by == "incomplete":
+            where, params = "completed = 0", ()
+        elif due_window(filter_by) is not None:
+            start, end = due_window(filter_by)
+            where, params = "completed = 0 AND due_date >= ? AND due_date < ?", (start.isoformat(), end.isoformat())
+        elif filter_by.startswith("priority:"):
+            where, params = "priority = ?", (filter_by.split(":")[1],)
+        elif filter_by.startswith("category:"):
+            where, params = "category = ?", (filter_by.split(":")[1],)
+        else:
+            return []
+        if sort_by in _SQL_ORDER:
+            order = _SQL_ORDER[sort_by]
+        elif sort_by in FIELDS:
+            order = f"{sort_by}, id"
+        else:
+            raise KeyError(sort_by)
+        rows = self.connection.execute(f"SELECT * FROM tasks WHERE {where} ORDER BY {order}", params)
+        return [self._task(row) for row in rows]
+
+    def search(self, query: str) -> List[Task]:
+        terms = tokenize(query)
+        if not terms:
+            return self.query()
+        if self.full_text:
+            # Every term as a quoted prefix query, ranked by BM25
+            rows = self.connection.execute(
+                "SELECT tasks.* FROM tasks_fts JOIN tasks ON tasks.id = tasks_fts.rowid"
+                " WHERE tasks_fts MATCH ? ORDER BY tasks_fts.rank, tasks.id",
+                (" AND ".join(f'"{term}"*' for term in terms),))
+            return [self._task(row) for row in rows]
+        # Without FTS5, fall back to a substring scan
+        rows = self.connection.execute(
+            "SELECT * FROM tasks WHERE instr(lower(description), :q) OR instr(lower(notes), :q)"
+            " OR instr(lower(category), :q) ORDER BY id", {"q": query})
+        return [self._task(row) for row in rows]
+
+    def stats(self) -> dict:
+        stats = TaskStats()
+        counters = {"priority": stats.by_priority, "category": stats.by_category}
+        for kind, key, value in self.connection.execute("SELECT * FROM task_counts WHERE value != 0"):
+            if kind in counters:
+                counters[kind][key] = value
+            elif kind == "completed":
+                stats.total += value
+                if key == "1":
+                    stats.completed = value
+            elif key == "count":
+                stats.timed = value
+            else:
+                stats.seconds_to_complete = value
+        start, end = due_window("overdue")
+        overdue = self.connection.execute(
+            "SELECT COUNT(*) FROM tasks WHERE completed = 0 AND due_date >= ? AND due_date < ?",
+            (start.isoformat(), end.isoformat())).fetchone()[0]
+        return stats.report(overdue)
+
+
+def open_storage(filename: str, fsync: str = FSYNC_NEVER, compact_threshold: int = 1000,
+                 background: bool = False) -> TaskStorage:
+    """Storage backend for filename, picked by its extension.
+
+    background only applies to JSON and .bin files; SQLite already commits each change in place.
+    """
+    if filename.lower().endswith(SQLITE_EXTENSIONS):
+        return SqliteStorage(filename, fsync)
+    if filename.lower().endswith(COLUMNAR_EXTENSIONS):
+        return ColumnarStorage(filename, fsync, compact_threshold, background)
+    return JsonStorage(filename, fsync, compact_threshold, background)
+
+
+def migrate(source: str, destination: str) -> int:
+    """Copy every task from one storage file to another (e.g. tasks.txt to tasks.db)"""
+    source_storage = open_storage(source)
+    destination_storage = open_storage(destination)
+    try:
+        if destination_storage.count():
+            raise ValueError(f"{destination} already contains tasks")
+        tasks = source_storage.query()
+        destination_storage.add_many(tasks)
+        destination_storage.flush()
+        return len(tasks)
+    finally:
+        source_storage.close()
+        destination_storage.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 3:
+        print("Usage: python task_storage.py SOURCE DESTINATION  (e.g. tasks.txt tasks.db)")
+        sys.exit(2)
+    try:
+        print(f"Migrated {migrate(sys.argv[1], sys.argv[2])} tasks to {sys.argv[2]}")
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
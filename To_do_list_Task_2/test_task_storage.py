@@ -0,0 +1,36 @@
+import pytest
+
+from task_model import Task
+from task_storage import open_storage, write_snapshot
+
+
+@pytest.mark.parametrize("name", ["tasks.txt", "tasks.bin", "tasks.db"])
+def test_removed_top_id_is_not_reused_after_reopening(tmp_path, name):
+    path = str(tmp_path / name)
+    storage = open_storage(path)
+    for task_id in (1, 2, 3):
+        storage.add(Task(task_id, f"task {task_id}", created_date="2024-01-01"))
+    storage.flush()
+    storage.remove(3)
+    storage.close()
+
+    storage = open_storage(path)
+    try:
+        assert storage.allocate_id() == 4
+    finally:
+        storage.close()
+
+
+def test_removed_top_id_of_a_plain_snapshot_is_not_reused(tmp_path):
+    # A tasks.txt saved before the journal existed has no id counter of its own
+    path = str(tmp_path / "tasks.txt")
+    write_snapshot(path, [Task(task_id, f"task {task_id}", created_date="2024-01-01").to_dict() for task_id in (1, 2, 3)])
+    storage = open_storage(path)
+    storage.remove(3)
+    storage.close()
+
+    storage = open_storage(path)
+    try:
+        assert storage.allocate_id() == 4
+    finally:
+        storage.close()